@@ -13,11 +13,14 @@ CREATE TABLE IF NOT EXISTS allergies (
     notes TEXT COMMENT '备注',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (patient_id) REFERENCES patients(patient_id) ON DELETE CASCADE,
-    INDEX idx_patient (patient_id),
+    INDEX idx_patient_date (patient_id, diagnosed_date),
     INDEX idx_type (allergen_type),
     INDEX idx_severity (severity)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='患者过敏记录表';
 
+-- 已有过敏记录表的索引升级: 按患者查询并按确诊日期排序时无需filesort
+ALTER TABLE allergies ADD INDEX IF NOT EXISTS idx_patient_date (patient_id, diagnosed_date);
+
 -- 咨询分类表(新增,用于标记常见病咨询的类型)
 CREATE TABLE IF NOT EXISTS consultation_categories (
     category_id INT PRIMARY KEY AUTO_INCREMENT,
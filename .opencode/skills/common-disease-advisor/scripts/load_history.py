@@ -3,15 +3,31 @@
 与SLE Skill共用同一个数据库
 """
 
+import functools
+import json
 import sys
 import os
-
-# 添加SLE Skill的scripts目录到路径
-sle_skill_path = "D:\\opencode\\.opencode\\skills\\sle-medical-advisor\\scripts"
+from pathlib import Path
+
+# SLE Skill的scripts目录: 默认与本Skill同级,可通过环境变量 SLE_SKILL_SCRIPTS 覆盖
+sle_skill_path = os.getenv(
+    'SLE_SKILL_SCRIPTS',
+    str(Path(__file__).resolve().parents[2] / 'sle-medical-advisor' / 'scripts')
+)
+# 本模块同样名为 load_history,SLE目录必须排在本目录之前,已在路径中时也移到最前
+while sle_skill_path in sys.path:
+    sys.path.remove(sle_skill_path)
 sys.path.insert(0, sle_skill_path)
 
 try:
+    from db_connector import execute_multi, execute_prepared
     from load_history import (
+        PATIENT_BY_ID_SQL,
+        MEDICAL_HISTORY_SQL,
+        ACTIVE_MEDICATIONS_SQL,
+        CONSULTATIONS_SQL,
+        HISTORY_ROW,
+        CONSULTATION_ROW,
         get_patient_by_id,
         get_patient_by_name,
         get_medical_history,
@@ -26,6 +42,49 @@ except ImportError as e:
     sys.exit(1)
 
 
+# 只查询咨询时用到的列,按 idx_patient_date 索引顺序读取
+ALLERGIES_SQL = """
+    SELECT allergy_id, allergen_name, symptoms
+    FROM allergies
+    WHERE patient_id = %s
+    ORDER BY diagnosed_date DESC
+"""
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_symptoms(raw: str) -> tuple:
+    """
+    解析过敏症状JSON字符串,相同的字符串只解析一次
+
+    Args:
+        raw: 症状JSON字符串
+
+    Returns:
+        症状元组,解析失败返回空元组
+    """
+    try:
+        return tuple(json.loads(raw))
+    except json.JSONDecodeError:
+        return ()
+
+
+def _decode_allergies(allergies):
+    """
+    原地解析过敏记录中的症状字段
+
+    Args:
+        allergies: 过敏记录列表
+
+    Returns:
+        解析后的过敏记录列表
+    """
+    for allergy in allergies:
+        if allergy.get('symptoms'):
+            # 返回列表副本,调用方修改时不会污染缓存
+            allergy['symptoms'] = list(_parse_symptoms(allergy['symptoms']))
+    return allergies
+
+
 def get_allergies(patient_id: int):
     """
     获取患者的过敏记录
@@ -37,28 +96,10 @@ def get_allergies(patient_id: int):
         过敏记录列表
     """
     try:
-        from db_connector import execute_query
-        import json
-
-        query = """
-            SELECT allergy_id, patient_id, allergen_type, allergen_name,
-                   severity, symptoms, diagnosed_date
-            FROM allergies
-            WHERE patient_id = %s
-            ORDER BY diagnosed_date DESC
-        """
-        result = execute_query(query, (patient_id,))
+        result = execute_prepared('get_allergies', ALLERGIES_SQL, (patient_id,))
 
         # 解析症状
-        allergies = result if result else []
-        for allergy in allergies:
-            if allergy.get('symptoms'):
-                try:
-                    allergy['symptoms'] = json.loads(allergy['symptoms'])
-                except json.JSONDecodeError:
-                    allergy['symptoms'] = []
-
-        return allergies
+        return _decode_allergies(result) if result else []
 
     except Exception as e:
         print(f"获取过敏记录错误: {e}")
@@ -75,24 +116,89 @@ def get_patient_history_for_advisor(patient_id: int):
     Returns:
         包含所有相关信息的字典
     """
-    # 获取基本信息
-    patient = get_patient_by_id(patient_id)
+    # 一次往返获取基本信息、病史、用药、过敏和咨询记录
+    results = execute_multi(
+        {
+            'patient': PATIENT_BY_ID_SQL,
+            'medical_history': MEDICAL_HISTORY_SQL,
+            'medications': ACTIVE_MEDICATIONS_SQL,
+            'allergies': ALLERGIES_SQL,
+            'consultations': CONSULTATIONS_SQL
+        },
+        [(patient_id,), (patient_id, 10), (patient_id,), (patient_id,), (patient_id, 5)]
+    )
 
-    if not patient:
+    if not results or not results.get('patient'):
         return {}
 
-    # 获取病史记录
-    medical_history = get_medical_history(patient_id)
+    patient = results['patient'][0]
+    medical_history = [HISTORY_ROW(r) for r in results['medical_history']]
+    medications = results['medications']
+    allergies = _decode_allergies(results['allergies'])
+    consultations = [CONSULTATION_ROW(r) for r in results['consultations']]
+
+    return _assemble_advisor_history(patient, medical_history, medications,
+                                     allergies, consultations)
+
+
+async def aget_allergies(patient_id: int):
+    """
+    获取患者的过敏记录(异步)
+
+    Args:
+        patient_id: 患者ID
+
+    Returns:
+        过敏记录列表
+    """
+    from load_history_async import aexecute_query
+
+    result = await aexecute_query(ALLERGIES_SQL, (patient_id,))
+    return _decode_allergies(result)
+
+
+async def aget_patient_history_for_advisor(patient_id: int):
+    """
+    并发获取患者用于常见病咨询的完整历史记录(异步)
+
+    Args:
+        patient_id: 患者ID
+
+    Returns:
+        包含所有相关信息的字典
+    """
+    import asyncio
+    from load_history_async import (
+        aget_patient_by_id,
+        aget_medical_history,
+        aget_medications,
+        aget_consultations
+    )
+
+    # 五个查询互不依赖,并发执行
+    patient, medical_history, medications, allergies, consultations = await asyncio.gather(
+        aget_patient_by_id(patient_id),
+        aget_medical_history(patient_id),
+        aget_medications(patient_id),
+        aget_allergies(patient_id),
+        aget_consultations(patient_id)
+    )
+
+    if not patient:
+        return {}
 
-    # 获取用药记录
-    medications = get_medications(patient_id)
+    return _assemble_advisor_history(patient, medical_history, medications,
+                                     allergies, consultations)
 
-    # 获取过敏记录
-    allergies = get_allergies(patient_id)
 
-    # 获取咨询记录
-    consultations = get_consultations(patient_id)
+def _assemble_advisor_history(patient, medical_history, medications,
+                              allergies, consultations):
+    """
+    组装常见病咨询所需的历史记录
 
+    Returns:
+        包含所有相关信息的字典
+    """
     # 提取基础疾病
     conditions = []
     for history in medical_history:
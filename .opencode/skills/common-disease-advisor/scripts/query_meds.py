@@ -4,15 +4,9 @@
 """
 
 import argparse
+import functools
 import json
-import sys
-import os
-
-# 添加父目录到路径,以便导入 db_connector
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from db_connector import execute_query
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
 
 # 简单的药品数据库(示例数据,实际应该从MySQL或文件读取)
@@ -148,6 +142,102 @@ MEDICATIONS_DB = {
 }
 
 
+# 症状与药品类别的映射
+SYMPTOM_CATEGORY_MAP = {
+    '发热': ['analgesics', 'cold_meds'],
+    '头疼': ['analgesics', 'cold_meds'],
+    '头痛': ['analgesics', 'cold_meds'],
+    '关节痛': ['analgesics'],
+    '肌肉痛': ['analgesics'],
+    '牙痛': ['analgesics'],
+    '痛经': ['analgesics'],
+    '咳嗽': ['cold_meds'],
+    '鼻塞': ['cold_meds'],
+    '流涕': ['cold_meds'],
+    '腹泻': ['digestive'],
+    '腹胀': ['digestive'],
+    '嗳气': ['digestive'],
+    '恶心': ['digestive'],
+    '呕吐': ['digestive'],
+    '胃痛': ['digestive'],
+    '腹痛': ['digestive'],
+    '反酸': ['digestive'],
+    '烧心': ['digestive'],
+    '皮疹': ['antihistamines'],
+    '荨麻疹': ['antihistamines'],
+    '过敏': ['antihistamines'],
+    '瘙痒': ['antihistamines'],
+    '鼻痒': ['antihistamines']
+}
+
+
+def _build_symptom_index() -> Dict[str, List[Dict]]:
+    """
+    预先计算 症状 -> 药品列表 的索引
+
+    Returns:
+        症状索引字典
+    """
+    index = {}
+    for symptom, categories in SYMPTOM_CATEGORY_MAP.items():
+        for category in categories:
+            for med in MEDICATIONS_DB.get(category, []):
+                if symptom in med['indications']:
+                    index.setdefault(symptom, []).append(med)
+    return index
+
+
+def _build_name_index() -> Dict[str, Dict]:
+    """
+    预先计算 药品名称/通用名 -> 药品 的索引
+
+    Returns:
+        名称索引字典
+    """
+    index = {}
+    for meds in MEDICATIONS_DB.values():
+        for med in meds:
+            index.setdefault(med['name'], med)
+            index.setdefault(med['generic_name'], med)
+    return index
+
+
+def _build_contraindication_sets() -> Dict[str, Tuple[frozenset, frozenset]]:
+    """
+    预先将每个药品的禁忌症和注意事项转换为frozenset
+
+    Returns:
+        药品名称 -> (禁忌症集合, 注意事项集合) 的字典
+    """
+    return {
+        med['name']: (frozenset(med['contraindications']),
+                      frozenset(med.get('precautions', ())))
+        for meds in MEDICATIONS_DB.values()
+        for med in meds
+    }
+
+
+_SYMPTOM_INDEX = _build_symptom_index()
+_NAME_INDEX = _build_name_index()
+_CONTRAINDICATION_SETS = _build_contraindication_sets()
+
+
+def _get_contraindication_sets(med: Dict) -> Tuple[frozenset, frozenset]:
+    """
+    获取药品的禁忌症和注意事项集合,不在药品库中的药品临时计算
+
+    Args:
+        med: 药品信息字典
+
+    Returns:
+        (禁忌症集合, 注意事项集合)
+    """
+    if _NAME_INDEX.get(med.get('name')) is med:
+        return _CONTRAINDICATION_SETS[med['name']]
+    return (frozenset(med['contraindications']),
+            frozenset(med.get('precautions', ())))
+
+
 def query_medications_by_category(category: str) -> List[Dict]:
     """
     按类别查询药品
@@ -171,45 +261,70 @@ def query_medications_by_symptom(symptom: str) -> List[Dict]:
     Returns:
         匹配的药品列表
     """
-    results = []
-
-    # 症状与药品类别的映射
-    symptom_category_map = {
-        '发热': ['analgesics', 'cold_meds'],
-        '头疼': ['analgesics', 'cold_meds'],
-        '头痛': ['analgesics', 'cold_meds'],
-        '关节痛': ['analgesics'],
-        '肌肉痛': ['analgesics'],
-        '牙痛': ['analgesics'],
-        '痛经': ['analgesics'],
-        '咳嗽': ['cold_meds'],
-        '鼻塞': ['cold_meds'],
-        '流涕': ['cold_meds'],
-        '腹泻': ['digestive'],
-        '腹胀': ['digestive'],
-        '嗳气': ['digestive'],
-        '恶心': ['digestive'],
-        '呕吐': ['digestive'],
-        '胃痛': ['digestive'],
-        '腹痛': ['digestive'],
-        '反酸': ['digestive'],
-        '烧心': ['digestive'],
-        '皮疹': ['antihistamines'],
-        '荨麻疹': ['antihistamines'],
-        '过敏': ['antihistamines'],
-        '瘙痒': ['antihistamines'],
-        '鼻痒': ['antihistamines']
-    }
+    return list(_SYMPTOM_INDEX.get(symptom, ()))
 
-    categories = symptom_category_map.get(symptom, [])
 
-    for category in categories:
-        meds = query_medications_by_category(category)
-        for med in meds:
-            if symptom in med['indications']:
-                results.append(med)
+def _build_symptom_automaton():
+    """
+    用症状关键词构建Aho-Corasick自动机,用于在自由文本中一次扫描出所有症状
 
-    return results
+    Returns:
+        ahocorasick.Automaton 对象,未安装 pyahocorasick 时返回None
+    """
+    try:
+        import ahocorasick
+    except ImportError:
+        print("警告: 未安装 pyahocorasick,自由文本症状匹配将退化为逐个关键词查找")
+        print("运行: pip install pyahocorasick")
+        return None
+
+    automaton = ahocorasick.Automaton()
+    for symptom in _SYMPTOM_INDEX:
+        automaton.add_word(symptom, symptom)
+    automaton.make_automaton()
+    return automaton
+
+
+_symptom_automaton = None
+
+
+def extract_symptoms(text: str) -> List[str]:
+    """
+    从自由文本中提取已知症状关键词
+
+    Args:
+        text: 症状描述文本,如 "我头痛还发热"
+
+    Returns:
+        按出现顺序去重后的症状列表
+    """
+    global _symptom_automaton
+    if _symptom_automaton is None:
+        _symptom_automaton = _build_symptom_automaton() or False
+
+    if _symptom_automaton:
+        found = (symptom for _, symptom in _symptom_automaton.iter(text))
+    else:
+        found = sorted((symptom for symptom in _SYMPTOM_INDEX if symptom in text), key=text.find)
+
+    return list(dict.fromkeys(found))
+
+
+def query_medications_by_free_text(text: str) -> List[Dict]:
+    """
+    按自由文本症状描述查询药品
+
+    Args:
+        text: 症状描述文本
+
+    Returns:
+        匹配任一症状的药品列表(去重)
+    """
+    results = {}
+    for symptom in extract_symptoms(text):
+        for med in _SYMPTOM_INDEX[symptom]:
+            results.setdefault(med['name'], med)
+    return list(results.values())
 
 
 def get_medication_details(name: str) -> Optional[Dict]:
@@ -222,15 +337,11 @@ def get_medication_details(name: str) -> Optional[Dict]:
     Returns:
         药品详细信息,不存在返回None
     """
-    for category, meds in MEDICATIONS_DB.items():
-        for med in meds:
-            if med['name'] == name or med['generic_name'] == name:
-                return med
-    return None
+    return _NAME_INDEX.get(name)
 
 
-def filter_by_contraindications(medications: List[Dict], allergies: List[str],
-                              conditions: List[str]) -> List[Dict]:
+def filter_by_contraindications(medications: List[Dict], allergies: Iterable[str],
+                              conditions: Iterable[str]) -> List[Dict]:
     """
     根据禁忌症过滤药品
 
@@ -242,21 +353,21 @@ def filter_by_contraindications(medications: List[Dict], allergies: List[str],
     Returns:
         过滤后的药品列表
     """
+    # 只有字符串才可能与禁忌症匹配,过敏记录字典等直接忽略
+    allergies = frozenset(a for a in allergies or () if isinstance(a, str))
+    conditions = frozenset(c for c in conditions or () if isinstance(c, str))
+
     filtered = []
 
     for med in medications:
+        contra_set, precaution_set = _get_contraindication_sets(med)
+
         # 检查过敏
-        has_allergy = any(
-            allergy in med['contraindications'] or
-            allergy in med.get('precautions', [])
-            for allergy in allergies
-        )
+        has_allergy = not allergies.isdisjoint(contra_set) or \
+            not allergies.isdisjoint(precaution_set)
 
         # 检查基础疾病
-        has_condition_conflict = any(
-            condition in med['contraindications']
-            for condition in conditions
-        )
+        has_condition_conflict = not conditions.isdisjoint(contra_set)
 
         if not has_allergy and not has_condition_conflict:
             filtered.append(med)
@@ -285,21 +396,38 @@ def recommend_medications(symptom: str, patient_history: Optional[Dict] = None)
             'medications': []
         }
 
-    # 如果有患者历史,进行过滤
+    allergies = conditions = None
     if patient_history:
         allergies = patient_history.get('allergies', [])
         conditions = patient_history.get('conditions', [])
 
-        if allergies or conditions:
-            medications = filter_by_contraindications(medications, allergies, conditions)
+    # 如果有患者历史,进行过滤;否则直接使用缓存的推荐结果
+    if allergies or conditions:
+        medications = filter_by_contraindications(medications, allergies, conditions)[:3]
+    else:
+        medications = list(_recommend_without_history(symptom))
 
     return {
         'success': True,
         'symptom': symptom,
-        'medications': medications[:3]  # 最多推荐3个
+        'medications': medications  # 最多推荐3个
     }
 
 
+@functools.lru_cache(maxsize=None)
+def _recommend_without_history(symptom: str) -> tuple:
+    """
+    无患者历史时的推荐结果(按症状缓存)
+
+    Args:
+        symptom: 症状描述
+
+    Returns:
+        最多3个推荐药品
+    """
+    return tuple(query_medications_by_symptom(symptom)[:3])
+
+
 def print_medication(med: Dict):
     """
     打印药品信息
@@ -330,11 +458,15 @@ def main():
                        choices=['analgesics', 'cold_meds', 'digestive', 'antihistamines'],
                        help='药品类别')
     parser.add_argument('--symptom', type=str, help='症状')
+    parser.add_argument('--text', type=str, help='自由文本症状描述,如 "我头痛还发热"')
     parser.add_argument('--name', type=str, help='药品名称')
     parser.add_argument('--output', type=str, help='输出JSON文件路径')
 
     args = parser.parse_args()
 
+    # 每个分支生成一个输出对象,供 --output 保存
+    output = None
+
     if args.name:
         # 查询单个药品
         med = get_medication_details(args.name)
@@ -342,33 +474,55 @@ def main():
             print_medication(med)
         else:
             print(f"未找到药品: {args.name}")
+        output = med or {}
 
     elif args.symptom:
         # 按症状查询
-        result = recommend_medications(args.symptom)
+        output = recommend_medications(args.symptom)
 
-        if result['success']:
+        if output['success']:
             print(f"\n适用于'{args.symptom}'的药品:")
-            for med in result['medications']:
+            for med in output['medications']:
                 print_medication(med)
         else:
-            print(result['message'])
+            print(output['message'])
+
+    elif args.text:
+        # 按自由文本查询
+        symptoms = extract_symptoms(args.text)
+        medications = query_medications_by_free_text(args.text)
+        output = {
+            'success': bool(medications),
+            'symptoms': symptoms,
+            'medications': medications
+        }
+
+        if medications:
+            print(f"\n识别到的症状: {', '.join(symptoms)}")
+            for med in medications:
+                print_medication(med)
+        else:
+            print(f'未找到适用于"{args.text}"的药品')
 
     elif args.category:
         # 按类别查询
         medications = query_medications_by_category(args.category)
+        output = {
+            'category': args.category,
+            'medications': medications
+        }
 
         print(f"\n{args.category} 类药品:")
         for med in medications:
             print_medication(med)
 
     else:
-        print("错误: 必须指定 --name, --symptom 或 --category 参数")
+        print("错误: 必须指定 --name, --symptom, --text 或 --category 参数")
 
-    # 保存结果
-    if args.output:
+    # 保存结果(紧凑格式,供程序读取)
+    if args.output and output is not None:
         with open(args.output, 'w', encoding='utf-8') as f:
-            json.dump(result if 'result' in locals() else {}, f, ensure_ascii=False, indent=2)
+            json.dump(output, f, ensure_ascii=False, separators=(',', ':'))
         print(f"\n结果已保存到: {args.output}")
 
 
@@ -4,10 +4,17 @@ MySQL数据库连接器
 """
 
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, PoolError, errorcode
+from mysql.connector.constants import ClientFlag
+from mysql.connector.pooling import MySQLConnectionPool
 import json
-from typing import Dict, List, Optional
+import logging
+from typing import Callable, Dict, Iterator, List, Optional
 import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
 
 # 数据库配置 - 从环境变量读取或使用默认值
 DB_CONFIG = {
@@ -15,40 +22,154 @@ DB_CONFIG = {
     'port': int(os.getenv('DB_PORT', 3306)),
     'user': os.getenv('DB_USER', 'root'),
     'password': os.getenv('DB_PASSWORD', ''),
-    'database': os.getenv('DB_NAME', 'sle_medical_advisor')
+    'database': os.getenv('DB_NAME', 'sle_medical_advisor'),
 }
 
+# 连接池大小 - 可通过环境变量调整
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+
+# 连接池耗尽时等待空闲连接的最长时间(秒)
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+
+# 多语句连接池大小 - 仅 execute_multi 使用
+DB_MULTI_POOL_SIZE = int(os.getenv('DB_MULTI_POOL_SIZE', 4))
+
+# 全局连接池(首次使用时创建,测试时可替换)
+POOL: Optional[MySQLConnectionPool] = None
+
+# 允许一次请求执行多条语句的连接池,与主连接池隔离,
+# 避免拼接SQL的写入接口(如 insert_record)可被注入堆叠语句
+MULTI_POOL: Optional[MySQLConnectionPool] = None
+
+# 连接ID -> {缓存键: 预处理游标},按最近使用排序,最多 DB_POOL_SIZE 条,见 execute_prepared
+_PREPARED: Dict[int, Dict[str, object]] = {}
+_PREPARED_LOCK = threading.Lock()
 
-def get_db_connection():
+# 表名 -> 更新成功后的回调列表,供上层缓存失效使用
+_UPDATE_HOOKS: Dict[str, List[Callable[[str, tuple], None]]] = {}
+
+
+def register_update_hook(table: str, hook: Callable[[str, tuple], None]):
     """
-    获取数据库连接
+    注册表更新回调,update_record 成功后以 (condition, params) 调用
 
-    Returns:
-        mysql.connector.connection: 数据库连接对象
+    insert_record / insert_many 写入带 patient_id 的记录后,
+    以 ('patient_id = %s', (patient_id,)) 调用
+
+    Args:
+        table: 表名
+        hook: 回调函数
     """
+    _UPDATE_HOOKS.setdefault(table, []).append(hook)
+
+
+def _notify_update(table: str, condition: str, params: tuple):
+    """依次调用表的更新回调"""
+    for hook in _UPDATE_HOOKS.get(table, ()):
+        hook(condition, params)
+
+
+def _notify_insert(table: str, rows: List[Dict]):
+    """插入成功后按患者通知更新回调"""
+    if table not in _UPDATE_HOOKS:
+        return
+    for patient_id in {row['patient_id'] for row in rows if 'patient_id' in row}:
+        _notify_update(table, 'patient_id = %s', (patient_id,))
+
+
+def _create_pool(pool_name: str, pool_size: int, **extra) -> MySQLConnectionPool:
+    """按 DB_CONFIG 创建连接池,数据库不存在时给出初始化提示"""
+    # 不在归还时重置会话: 重置会释放服务端的预处理语句(见 execute_prepared)
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        if conn.is_connected():
-            print("成功连接到MySQL数据库")
-            return conn
+        return MySQLConnectionPool(
+            pool_name=pool_name,
+            pool_size=pool_size,
+            pool_reset_session=False,
+            **DB_CONFIG,
+            **extra
+        )
     except Error as e:
-        print(f"数据库连接错误: {e}")
-        return None
+        if e.errno == errorcode.ER_BAD_DB_ERROR:
+            raise Error(msg=f"数据库 {DB_CONFIG['database']} 不存在,请先执行 db_schema.sql",
+                        errno=e.errno)
+        raise
+
+
+def get_pool() -> MySQLConnectionPool:
+    """
+    获取全局连接池,首次调用时创建
+
+    Returns:
+        MySQLConnectionPool: 连接池对象
+    """
+    global POOL
+    if POOL is None:
+        POOL = _create_pool("sle", DB_POOL_SIZE)
+    return POOL
+
+
+def get_multi_pool() -> MySQLConnectionPool:
+    """
+    获取允许多语句执行的连接池,首次调用时创建
+
+    Returns:
+        MySQLConnectionPool: 连接池对象
+    """
+    global MULTI_POOL
+    if MULTI_POOL is None:
+        MULTI_POOL = _create_pool("sle_multi", DB_MULTI_POOL_SIZE,
+                                  client_flags=[ClientFlag.MULTI_STATEMENTS])
+    return MULTI_POOL
+
+
+def get_db_connection(pool_getter: Callable[[], MySQLConnectionPool] = get_pool):
+    """
+    从连接池获取数据库连接
+
+    连接池耗尽时不立即失败,在 DB_POOL_TIMEOUT 内等待其他调用归还连接
+
+    Args:
+        pool_getter: 返回连接池的函数,默认主连接池
+
+    Returns:
+        mysql.connector.connection: 数据库连接对象,失败返回None
+    """
+    deadline = time.monotonic() + DB_POOL_TIMEOUT
+    delay = 0.01
+    while True:
+        try:
+            return pool_getter().get_connection()
+        except PoolError as e:
+            if time.monotonic() >= deadline:
+                logger.error("等待数据库连接超时: %s", e)
+                return None
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
+        except Error as e:
+            logger.error("数据库连接错误: %s", e)
+            return None
 
 
 def close_connection(conn):
     """
-    关闭数据库连接
+    归还数据库连接到连接池
+
+    归还前回滚,结束只读路径遗留的事务: 连接池不重置会话,
+    否则下一个借用者会沿用旧的 REPEATABLE READ 快照读到过期数据
 
     Args:
         conn: 数据库连接对象
     """
-    if conn and conn.is_connected():
+    if conn:
+        try:
+            conn.rollback()
+        except Error as e:
+            logger.error("归还连接前回滚失败: %s", e)
         conn.close()
-        print("数据库连接已关闭")
 
 
-def execute_query(query: str, params: Optional[tuple] = None, fetch: bool = True) -> Optional[List[tuple]]:
+def execute_query(query: str, params: Optional[tuple] = None, fetch: bool = True,
+                  stream: bool = False) -> Optional[List[tuple]]:
     """
     执行SQL查询
 
@@ -56,14 +177,18 @@ def execute_query(query: str, params: Optional[tuple] = None, fetch: bool = True
         query: SQL查询语句
         params: 查询参数
         fetch: 是否返回查询结果
+        stream: 是否以生成器逐行返回结果(非缓冲游标,适合只遍历一次的大结果集)
 
     Returns:
-        查询结果列表(如果fetch=True)
+        查询结果列表(如果fetch=True),stream=True时返回逐行生成器
     """
     conn = get_db_connection()
     if not conn:
         return None
 
+    if stream:
+        return _stream_query(conn, query, params)
+
     try:
         cursor = conn.cursor(dictionary=True)  # 使用字典游标
         cursor.execute(query, params)
@@ -81,10 +206,179 @@ def execute_query(query: str, params: Optional[tuple] = None, fetch: bool = True
             return affected_rows
 
     except Error as e:
-        print(f"查询执行错误: {e}")
+        logger.error("查询执行错误: %s", e)
+        close_connection(conn)
+        return None
+
+
+def execute_prepared(key: str, query: str, params: Optional[tuple] = None,
+                     row_mapper: Optional[Callable[[Dict], Dict]] = None) -> Optional[List[Dict]]:
+    """
+    使用服务端预处理语句执行热点SELECT查询
+
+    预处理游标按连接ID和key缓存,同一连接重复执行时
+    服务端无需再次解析SQL
+
+    Args:
+        key: 预处理语句的缓存键
+        query: SQL查询语句
+        params: 查询参数
+        row_mapper: 构造每行字典时调用的映射函数(如解析JSON字段)
+
+    Returns:
+        查询结果列表,失败返回None
+    """
+    conn = get_db_connection()
+    if not conn:
+        return None
+
+    # 池化连接每次取出都是新的包装对象,按服务端连接ID缓存
+    connection_id = conn.connection_id
+    prepared = _prepared_cursors(connection_id)
+
+    try:
+        cursor = prepared.get(key)
+        if cursor is None:
+            cursor = prepared[key] = conn.cursor(prepared=True)
+
+        cursor.execute(query, params)
+        columns = cursor.column_names
+        if row_mapper:
+            result = [row_mapper(dict(zip(columns, row))) for row in cursor.fetchall()]
+        else:
+            result = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        close_connection(conn)
+        return result
+
+    except Error as e:
+        logger.error("预处理查询执行错误: %s", e)
+        # 连接可能已重连,丢弃该连接上缓存的预处理语句
+        with _PREPARED_LOCK:
+            _PREPARED.pop(connection_id, None)
+        close_connection(conn)
+        return None
+
+
+def _prepared_cursors(connection_id: int) -> Dict[str, object]:
+    """
+    取出连接上缓存的预处理游标,并标记为最近使用
+
+    连接池重连后连接ID会变化,旧ID的条目不会再被使用;存活的连接不超过
+    DB_POOL_SIZE 个,条目数达到上限时丢弃最久未使用的条目
+
+    Args:
+        connection_id: 服务端连接ID
+
+    Returns:
+        {缓存键: 预处理游标} 字典
+    """
+    with _PREPARED_LOCK:
+        prepared = _PREPARED.pop(connection_id, None)
+        if prepared is None:
+            prepared = {}
+            while len(_PREPARED) >= DB_POOL_SIZE:
+                del _PREPARED[next(iter(_PREPARED))]
+        _PREPARED[connection_id] = prepared
+        return prepared
+
+
+def _stream_query(conn, query: str, params: Optional[tuple]) -> Iterator[Dict]:
+    """
+    使用非缓冲游标逐行读取查询结果,遍历结束后归还连接
+
+    Args:
+        conn: 数据库连接对象
+        query: SQL查询语句
+        params: 查询参数
+
+    Yields:
+        查询结果行
+    """
+    cursor = None
+    try:
+        cursor = conn.cursor(dictionary=True, buffered=False)
+        cursor.execute(query, params)
+        yield from cursor
+    except Error as e:
+        logger.error("查询执行错误: %s", e)
+    finally:
+        # 调用方提前结束遍历时,丢弃未读取的行再归还连接
+        if conn.unread_result:
+            conn.consume_results()
+        if cursor:
+            cursor.close()
         close_connection(conn)
+
+
+def execute_multi(statements: Dict[str, str], params_list: List[tuple]) -> Optional[Dict[str, List[Dict]]]:
+    """
+    在一次网络往返中执行多条SELECT语句
+
+    Args:
+        statements: 有序的 {结果名称: SQL语句} 字典
+        params_list: 与statements顺序一一对应的参数元组列表
+
+    Returns:
+        {结果名称: 查询结果列表} 字典,失败返回None
+    """
+    conn = get_db_connection(get_multi_pool)
+    if not conn:
         return None
 
+    names = list(statements.keys())
+    query = '; '.join(sql.strip().rstrip(';') for sql in statements.values())
+    params = tuple(p for stmt_params in params_list for p in stmt_params)
+
+    cursor = None
+    try:
+        cursor = conn.cursor(dictionary=True)
+        # 读完全部结果集,避免连接上残留未读结果
+        result_sets = list(_iter_result_sets(cursor, query, params))
+        return dict(zip(names, result_sets))
+
+    except Error as e:
+        logger.error("批量查询执行错误: %s", e)
+        return None
+
+    finally:
+        if cursor:
+            cursor.close()
+        close_connection(conn)
+
+
+def _iter_result_sets(cursor, query: str, params: tuple) -> Iterator[List[Dict]]:
+    """
+    执行多语句查询并依次返回每个带结果集语句的全部行
+
+    mysql-connector-python 9.2 起移除了 execute 的 multi 参数,
+    改为执行后通过 nextset() 切换结果集;两种接口都兼容
+
+    Args:
+        cursor: 游标对象
+        query: 以分号连接的多条SQL语句
+        params: 全部语句的参数
+
+    Yields:
+        每个结果集的行列表
+    """
+    try:
+        results = cursor.execute(query, params, multi=True)
+    except TypeError:
+        results = None
+
+    if results is not None:
+        for result in results:
+            if result.with_rows:
+                yield result.fetchall()
+        return
+
+    cursor.execute(query, params)
+    while True:
+        if cursor.with_rows:
+            yield cursor.fetchall()
+        if not cursor.nextset():
+            break
+
 
 def insert_record(table: str, data: Dict) -> Optional[int]:
     """
@@ -116,15 +410,88 @@ def insert_record(table: str, data: Dict) -> Optional[int]:
         cursor.close()
         close_connection(conn)
 
-        print(f"成功插入记录到 {table}, ID: {record_id}")
+        logger.debug("成功插入记录到 %s, ID: %s", table, record_id)
+        _notify_insert(table, [data])
         return record_id
 
     except Error as e:
-        print(f"插入记录错误: {e}")
+        logger.error("插入记录错误: %s", e)
         close_connection(conn)
         return None
 
 
+def insert_many(table: str, rows: List[Dict]) -> int:
+    """
+    批量插入记录到指定表(单条INSERT语句,一次提交)
+
+    Args:
+        table: 表名
+        rows: 字段数据字典列表,所有字典的字段必须一致
+
+    Returns:
+        插入的记录数,失败返回0
+    """
+    if not rows:
+        return 0
+
+    columns = list(rows[0].keys())
+    if any(set(row.keys()) != set(columns) for row in rows):
+        raise ValueError(f"批量插入 {table} 的记录字段不一致")
+
+    conn = get_db_connection()
+    if not conn:
+        return 0
+
+    try:
+        cursor = conn.cursor()
+
+        # 构建插入语句
+        placeholders = ', '.join(['%s'] * len(columns))
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+
+        cursor.executemany(query, [tuple(row[c] for c in columns) for row in rows])
+        conn.commit()
+
+        inserted_rows = cursor.rowcount
+        cursor.close()
+        close_connection(conn)
+
+        logger.debug("成功批量插入 %s 条记录到 %s", inserted_rows, table)
+        _notify_insert(table, rows)
+        return inserted_rows
+
+    except Error as e:
+        logger.error("批量插入记录错误: %s", e)
+        close_connection(conn)
+        return 0
+
+
+def bulk_insert_indicators(report_id: int, indicators: List[Dict]) -> int:
+    """
+    批量写入一份检查单的所有指标(一次往返)
+
+    Args:
+        report_id: 检查单ID
+        indicators: parse_reports 解析出的指标列表
+
+    Returns:
+        插入的记录数,失败返回0
+    """
+    rows = [
+        {
+            'report_id': report_id,
+            'indicator_name': indicator['name'],
+            'indicator_value': indicator['value'],
+            'unit': indicator.get('unit', ''),
+            'reference_range': indicator.get('reference_range', ''),
+            'is_abnormal': bool(indicator.get('is_abnormal')),
+            'notes': indicator.get('notes', '')
+        }
+        for indicator in indicators
+    ]
+    return insert_many('lab_indicators', rows)
+
+
 def update_record(table: str, data: Dict, condition: str, params: tuple) -> bool:
     """
     更新记录
@@ -157,11 +524,12 @@ def update_record(table: str, data: Dict, condition: str, params: tuple) -> bool
         cursor.close()
         close_connection(conn)
 
-        print(f"成功更新 {affected_rows} 条记录")
+        logger.debug("成功更新 %s 条记录", affected_rows)
+        _notify_update(table, condition, params)
         return affected_rows > 0
 
     except Error as e:
-        print(f"更新记录错误: {e}")
+        logger.error("更新记录错误: %s", e)
         close_connection(conn)
         return False
 
@@ -170,23 +538,32 @@ def check_database_exists() -> bool:
     """
     检查数据库是否存在
 
+    连接池在创建时会连接到目标数据库,数据库不存在时直接返回False,
+    否则复用池中的连接查询 information_schema,不再单独建立连接
+
     Returns:
         数据库是否存在
     """
-    conn = get_db_connection()
-    if not conn:
+    try:
+        conn = get_pool().get_connection()
+    except Error as e:
+        if e.errno != errorcode.ER_BAD_DB_ERROR:
+            logger.error("检查数据库错误: %s", e)
         return False
 
     try:
         cursor = conn.cursor()
-        cursor.execute("SHOW DATABASES LIKE %s", (DB_CONFIG['database'],))
+        cursor.execute(
+            "SELECT SCHEMA_NAME FROM information_schema.SCHEMATA WHERE SCHEMA_NAME = %s",
+            (DB_CONFIG['database'],)
+        )
         result = cursor.fetchone()
         cursor.close()
         close_connection(conn)
         return result is not None
 
     except Error as e:
-        print(f"检查数据库错误: {e}")
+        logger.error("检查数据库错误: %s", e)
         close_connection(conn)
         return False
 
@@ -42,6 +42,7 @@ CREATE TABLE IF NOT EXISTS medical_reports (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (patient_id) REFERENCES patients(patient_id) ON DELETE CASCADE,
     INDEX idx_patient_date (patient_id, report_date),
+    INDEX idx_patient_type_date (patient_id, report_type, report_date),
     INDEX idx_type (report_type)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
@@ -89,3 +90,6 @@ CREATE TABLE IF NOT EXISTS consultations (
     FOREIGN KEY (patient_id) REFERENCES patients(patient_id) ON DELETE CASCADE,
     INDEX idx_patient_date (patient_id, consultation_date)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 已有数据库升级: 按类型查询检查单的索引(只需执行一次)
+-- ALTER TABLE medical_reports ADD INDEX idx_patient_type_date (patient_id, report_type, report_date);
@@ -3,12 +3,99 @@
 基于患者的历史数据、检查结果和症状信息
 """
 
+import itertools
 import json
-from typing import Dict, List, Optional
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from datetime import datetime
 
 
-def build_knowledge_node(node_type: str, name: str, data: Dict) -> Dict:
+@dataclass(slots=True)
+class KGNode:
+    """知识图谱节点"""
+    type: str
+    name: str
+    data: Dict
+    timestamp: str
+
+
+@dataclass(slots=True)
+class KGEdge:
+    """知识图谱边"""
+    source: str
+    target: str
+    relation: str
+    weight: float
+    data: Dict
+    timestamp: str
+
+
+@dataclass
+class IndicatorTable:
+    """
+    按列存储的检查指标(SoA)
+
+    每个指标名称只保留最近一次检查的结果,各列按相同下标对齐
+    """
+    names: List[str] = field(default_factory=list)
+    values: List[Any] = field(default_factory=list)
+    units: List[str] = field(default_factory=list)
+    reference_ranges: List[str] = field(default_factory=list)
+    last_checks: List[Any] = field(default_factory=list)
+    is_abnormal: List[bool] = field(default_factory=list)
+
+    @classmethod
+    def from_lab_reports(cls, lab_reports: List[Dict]) -> 'IndicatorTable':
+        """
+        从检查单列表构建指标表
+
+        Args:
+            lab_reports: 检查单列表,每个检查单包含 report_date 和 indicators
+
+        Returns:
+            指标表
+        """
+        table = cls()
+        columns = (table.values, table.units, table.reference_ranges,
+                   table.last_checks, table.is_abnormal)
+        positions = {}
+
+        for report in lab_reports:
+            report_date = report.get('report_date', '')
+            for indicator in report.get('indicators', []):
+                name = indicator['name']
+                row = (indicator['value'], indicator.get('unit', ''),
+                       indicator.get('reference_range', ''), report_date,
+                       bool(indicator.get('is_abnormal', False)))
+
+                pos = positions.get(name)
+                if pos is None:
+                    positions[name] = len(table.names)
+                    table.names.append(name)
+                    for column, value in zip(columns, row):
+                        column.append(value)
+                elif str(report_date) > str(table.last_checks[pos]):
+                    # 同一指标出现在多份检查单中时,只保留最近一次检查的结果
+                    for column, value in zip(columns, row):
+                        column[pos] = value
+
+        return table
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def abnormal_count(self) -> int:
+        """异常指标数"""
+        return sum(self.is_abnormal)
+
+    def rows(self) -> Iterator[Tuple]:
+        """按行遍历 (名称, 值, 单位, 参考范围, 最近检查日期, 是否异常)"""
+        return zip(self.names, self.values, self.units, self.reference_ranges,
+                   self.last_checks, self.is_abnormal)
+
+
+def build_knowledge_node(node_type: str, name: str, data: Dict,
+                         timestamp: Optional[str] = None) -> KGNode:
     """
     创建知识图谱节点
 
@@ -16,20 +103,17 @@ def build_knowledge_node(node_type: str, name: str, data: Dict) -> Dict:
         node_type: 节点类型 (patient/disease/symptom/indicator/treatment)
         name: 节点名称
         data: 节点数据
+        timestamp: 时间戳,不指定则使用当前时间
 
     Returns:
-        节点字典
+        节点对象
     """
-    return {
-        'type': node_type,
-        'name': name,
-        'data': data,
-        'timestamp': datetime.now().isoformat()
-    }
+    return KGNode(node_type, name, data, timestamp or datetime.now().isoformat())
 
 
 def build_knowledge_edge(source: str, target: str, relation: str,
-                         weight: float = 1.0, data: Optional[Dict] = None) -> Dict:
+                         weight: float = 1.0, data: Optional[Dict] = None,
+                         timestamp: Optional[str] = None) -> KGEdge:
     """
     创建知识图谱边
 
@@ -39,18 +123,13 @@ def build_knowledge_edge(source: str, target: str, relation: str,
         relation: 关系类型
         weight: 关系权重
         data: 附加数据
+        timestamp: 时间戳,不指定则使用当前时间
 
     Returns:
-        边字典
+        边对象
     """
-    return {
-        'source': source,
-        'target': target,
-        'relation': relation,
-        'weight': weight,
-        'data': data or {},
-        'timestamp': datetime.now().isoformat()
-    }
+    return KGEdge(source, target, relation, weight, data or {},
+                  timestamp or datetime.now().isoformat())
 
 
 def build_patient_kg(patient_id: int, patient_data: Dict) -> Dict:
@@ -64,12 +143,20 @@ def build_patient_kg(patient_id: int, patient_data: Dict) -> Dict:
     Returns:
         知识图谱数据
     """
-    nodes = []
+    # 以 "类型_名称" 为键,保证每个实体只生成一个节点
+    nodes_by_id = {}
     edges = []
+    now = datetime.now().isoformat()
+
+    def add_node(node_type: str, name: str, data: Dict) -> KGNode:
+        node_id = f'{node_type}_{name}'
+        if node_id not in nodes_by_id:
+            nodes_by_id[node_id] = build_knowledge_node(node_type, name, data, timestamp=now)
+        return nodes_by_id[node_id]
 
     # 1. 创建患者节点
     patient = patient_data.get('patient', {})
-    patient_node = build_knowledge_node(
+    add_node(
         'patient',
         patient.get('patient_name', f'患者{patient_id}'),
         {
@@ -78,7 +165,6 @@ def build_patient_kg(patient_id: int, patient_data: Dict) -> Dict:
             'age': calculate_age(patient.get('birth_date'))
         }
     )
-    nodes.append(patient_node)
 
     # 2. 创建疾病节点(基于诊断)
     diagnoses = set()
@@ -87,10 +173,9 @@ def build_patient_kg(patient_id: int, patient_data: Dict) -> Dict:
             diagnoses.add(history['diagnosis'])
 
     for diagnosis in diagnoses:
-        disease_node = build_knowledge_node('disease', diagnosis, {})
-        nodes.append(disease_node)
+        add_node('disease', diagnosis, {})
         edges.append(build_knowledge_edge(
-            f'patient_{patient_id}', f'disease_{diagnosis}', 'has_disease'
+            f'patient_{patient_id}', f'disease_{diagnosis}', 'has_disease', timestamp=now
         ))
 
     # 3. 创建症状节点
@@ -100,74 +185,79 @@ def build_patient_kg(patient_id: int, patient_data: Dict) -> Dict:
             symptoms_count[symptom] = symptoms_count.get(symptom, 0) + 1
 
     for symptom, count in symptoms_count.items():
-        symptom_node = build_knowledge_node('symptom', symptom, {'frequency': count})
-        nodes.append(symptom_node)
+        add_node('symptom', symptom, {'frequency': count})
         edges.append(build_knowledge_edge(
             f'patient_{patient_id}', f'symptom_{symptom}', 'experiences',
-            weight=count
+            weight=count, timestamp=now
         ))
 
     # 4. 创建检查指标节点
+    indicator_table = IndicatorTable.from_lab_reports(patient_data.get('lab_reports', []))
+    for name, value, unit, reference_range, last_check, is_abnormal in indicator_table.rows():
+        add_node('indicator', name, {
+            'value': value,
+            'unit': unit,
+            'is_abnormal': is_abnormal,
+            'reference_range': reference_range,
+            'last_check': last_check
+        })
+
+    top_symptoms = list(symptoms_count)[:3]  # 异常指标关联前3个症状
     for report in patient_data.get('lab_reports', []):
         report_date = report.get('report_date', '')
         for indicator in report.get('indicators', []):
             indicator_name = indicator['name']
-            indicator_value = indicator['value']
-
-            indicator_node = build_knowledge_node('indicator', indicator_name, {
-                'value': indicator_value,
-                'unit': indicator.get('unit', ''),
-                'is_abnormal': indicator.get('is_abnormal', False),
-                'reference_range': indicator.get('reference_range', ''),
-                'last_check': report_date
-            })
-            nodes.append(indicator_node)
             edges.append(build_knowledge_edge(
                 f'patient_{patient_id}', f'indicator_{indicator_name}', 'has_result',
-                data={'date': report_date}
+                data={'date': report_date}, timestamp=now
             ))
 
             # 如果异常,创建与症状的关联
             if indicator.get('is_abnormal'):
-                for symptom in list(symptoms_count.keys())[:3]:  # 关联前3个症状
-                    edges.append(build_knowledge_edge(
+                edges.extend(
+                    build_knowledge_edge(
                         f'indicator_{indicator_name}', f'symptom_{symptom}',
-                        'related_to', weight=0.5
-                    ))
+                        'related_to', weight=0.5, timestamp=now
+                    )
+                    for symptom in top_symptoms
+                )
 
     # 5. 创建治疗节点(用药)
     for medication in patient_data.get('medications', []):
         med_name = medication['medication_name']
-        medication_node = build_knowledge_node('treatment', med_name, {
+        add_node('treatment', med_name, {
             'dosage': medication.get('dosage'),
             'frequency': medication.get('frequency'),
             'active': not medication.get('end_date')
         })
-        nodes.append(medication_node)
         edges.append(build_knowledge_edge(
-            f'patient_{patient_id}', f'treatment_{med_name}', 'takes'
+            f'patient_{patient_id}', f'treatment_{med_name}', 'takes', timestamp=now
         ))
 
     # 6. 关联疾病和治疗
-    for diagnosis in diagnoses:
-        for medication in patient_data.get('medications', [])[:3]:  # 关联前3个用药
-            edges.append(build_knowledge_edge(
-                f'disease_{diagnosis}', f'treatment_{medication["medication_name"]}',
-                'treated_by'
-            ))
+    top_meds = [m['medication_name'] for m in patient_data.get('medications', [])[:3]]  # 关联前3个用药
+    edges.extend(
+        build_knowledge_edge(
+            f'disease_{diagnosis}', f'treatment_{med_name}', 'treated_by', timestamp=now
+        )
+        for diagnosis, med_name in itertools.product(diagnoses, top_meds)
+    )
+
+    nodes = list(nodes_by_id.values())
 
     return {
         'nodes': nodes,
         'edges': edges,
         'patient_id': patient_id,
-        'created_at': datetime.now().isoformat(),
+        'created_at': now,
         'statistics': {
             'total_nodes': len(nodes),
             'total_edges': len(edges),
             'diseases': len(diagnoses),
             'symptoms': len(symptoms_count),
-            'indicators': len([n for n in nodes if n['type'] == 'indicator']),
-            'treatments': len([n for n in nodes if n['type'] == 'treatment'])
+            'indicators': len(indicator_table),
+            'abnormal_indicators': indicator_table.abnormal_count(),
+            'treatments': sum(1 for n in nodes if n.type == 'treatment')
         }
     }
 
@@ -194,6 +284,25 @@ def calculate_age(birth_date: Optional[str]) -> Optional[int]:
         return None
 
 
+def count_indicators(nodes: List[KGNode]) -> Tuple[int, int]:
+    """
+    单次遍历统计指标节点总数和异常指标数
+
+    Args:
+        nodes: 节点列表
+
+    Returns:
+        (指标总数, 异常指标数)
+    """
+    total = abnormal = 0
+    for node in nodes:
+        if node.type == 'indicator':
+            total += 1
+            if node.data.get('is_abnormal'):
+                abnormal += 1
+    return total, abnormal
+
+
 def analyze_disease_progression(kg: Dict) -> Dict:
     """
     分析疾病进展
@@ -204,19 +313,23 @@ def analyze_disease_progression(kg: Dict) -> Dict:
     Returns:
         疾病进展分析
     """
-    indicators = [n for n in kg['nodes'] if n['type'] == 'indicator']
-    abnormal_count = len([i for i in indicators if i['data'].get('is_abnormal')])
+    # 构建时已统计过则直接使用
+    stats = kg.get('statistics', {})
+    if 'abnormal_indicators' in stats:
+        total_count, abnormal_count = stats['indicators'], stats['abnormal_indicators']
+    else:
+        total_count, abnormal_count = count_indicators(kg['nodes'])
 
     progression = {
         'abnormal_indicators': abnormal_count,
-        'total_indicators': len(indicators),
+        'total_indicators': total_count,
         'severity': 'mild',
         'trend': 'stable'
     }
 
-    if abnormal_count > len(indicators) * 0.5:
+    if abnormal_count > total_count * 0.5:
         progression['severity'] = 'severe'
-    elif abnormal_count > len(indicators) * 0.3:
+    elif abnormal_count > total_count * 0.3:
         progression['severity'] = 'moderate'
 
     return progression
@@ -230,13 +343,6 @@ def export_kg_to_graphviz(kg: Dict, output_path: str):
         kg: 知识图谱
         output_path: 输出文件路径
     """
-    graphviz = """
-digraph SLE_Knowledge_Graph {
-    rankdir=LR;
-    node [shape=box, style=filled];
-
-"""
-
     # 添加节点
     node_colors = {
         'patient': 'lightblue',
@@ -246,20 +352,30 @@ digraph SLE_Knowledge_Graph {
         'treatment': 'lightpink'
     }
 
-    for node in kg['nodes']:
-        color = node_colors.get(node['type'], 'white')
-        label = node['name']
-        graphviz += f'    "{node["type"]}_{node["name"]}" [fillcolor="{color}", label="{label}"];\n'
+    parts = ["""
+digraph SLE_Knowledge_Graph {
+    rankdir=LR;
+    node [shape=box, style=filled];
+
+"""]
+
+    parts.extend(
+        f'    "{node.type}_{node.name}" '
+        f'[fillcolor="{node_colors.get(node.type, "white")}", label="{node.name}"];\n'
+        for node in kg['nodes']
+    )
 
     # 添加边
-    graphviz += "\n"
-    for edge in kg['edges']:
-        graphviz += f'    "{edge["source"]}" -> "{edge["target"]}" [label="{edge["relation"]}"];\n'
+    parts.append("\n")
+    parts.extend(
+        f'    "{edge.source}" -> "{edge.target}" [label="{edge.relation}"];\n'
+        for edge in kg['edges']
+    )
 
-    graphviz += "}\n"
+    parts.append("}\n")
 
     with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(graphviz)
+        f.writelines(parts)
 
     print(f"知识图谱已导出到: {output_path}")
 
@@ -272,8 +388,15 @@ def save_kg(kg: Dict, output_path: str):
         kg: 知识图谱
         output_path: 输出文件路径
     """
+    # 节点和边只在序列化时转换为字典
+    serializable = {
+        **kg,
+        'nodes': [asdict(node) for node in kg['nodes']],
+        'edges': [asdict(edge) for edge in kg['edges']]
+    }
+
     with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(kg, f, ensure_ascii=False, indent=2)
+        json.dump(serializable, f, ensure_ascii=False, indent=2)
 
     print(f"知识图谱已保存到: {output_path}")
 
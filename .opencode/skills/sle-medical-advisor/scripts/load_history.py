@@ -2,14 +2,248 @@
 从MySQL数据库读取患者历史病情记录
 """
 
-from db_connector import execute_query
-from typing import Dict, List, Optional
+from db_connector import execute_query, execute_prepared, execute_multi, register_update_hook
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
 import json
+import os
+import threading
+import time
+
+# 优先使用 orjson 读写JSON(C实现,更快,原生支持日期类型),未安装时退回标准库
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
+
+# 按患者查询的SQL语句,供单项查询和批量查询(execute_multi)共用
+# 子表查询不再返回调用方已知的 patient_id
+PATIENT_BY_ID_SQL = """
+    SELECT patient_id, patient_name, gender, birth_date,
+           contact_phone, email
+    FROM patients
+    WHERE patient_id = %s
+"""
+
+MEDICAL_HISTORY_SQL = """
+    SELECT id, record_date, diagnosis, symptoms,
+           doctor_name, hospital_name, notes
+    FROM medical_history
+    WHERE patient_id = %s
+    ORDER BY record_date DESC
+    LIMIT %s
+"""
+
+ACTIVE_MEDICATIONS_SQL = """
+    SELECT medication_id, medication_name,
+           dosage, frequency, start_date, end_date, notes
+    FROM medications
+    WHERE patient_id = %s AND (end_date IS NULL OR end_date >= CURDATE())
+    ORDER BY start_date DESC
+"""
+
+CONSULTATIONS_SQL = """
+    SELECT consultation_id, consultation_date,
+           symptoms, questions, advice, follow_up_date
+    FROM consultations
+    WHERE patient_id = %s
+    ORDER BY consultation_date DESC
+    LIMIT %s
+"""
+
+# 检查单查询的公共部分,按需追加报告类型过滤、排序和LIMIT
+PATIENT_REPORTS_SQL = """
+    SELECT report_id, report_type, report_date,
+           hospital_name, doctor_name, file_path, parsed_data
+    FROM medical_reports
+    WHERE patient_id = %s
+"""
+
+PATIENT_REPORTS_BY_TYPE_SQL = PATIENT_REPORTS_SQL + """
+    AND report_type = %s
+    ORDER BY report_date DESC
+    LIMIT %s
+"""
+
+PATIENT_ALL_REPORTS_SQL = PATIENT_REPORTS_SQL + """
+    ORDER BY report_date DESC
+    LIMIT %s
+"""
+
+
+
+def reports_by_types_sql(type_count: int) -> str:
+    """
+    生成按多个报告类型分别取最近N条的UNION ALL查询
+
+    Args:
+        type_count: 报告类型数量
+
+    Returns:
+        SQL语句,参数依次为每个类型的 (patient_id, report_type, limit)
+    """
+    # 子查询中的ORDER BY只决定各自取哪些行,合并结果需要再排序
+    union = ' UNION ALL '.join([f"({PATIENT_REPORTS_BY_TYPE_SQL.strip()})"] * type_count)
+    return union + " ORDER BY report_date DESC"
+
+
+# 完整历史使用的病理+化验检查单查询
+PATHOLOGY_AND_LAB_REPORTS_SQL = reports_by_types_sql(2)
+
+REPORT_INDICATORS_SQL = """
+    SELECT indicator_id, indicator_name,
+           indicator_value, unit, reference_range,
+           is_abnormal, notes
+    FROM lab_indicators
+    WHERE report_id = %s
+    ORDER BY indicator_name
+"""
+
+
+def json_row_mapper(fields: Dict[str, Callable]) -> Callable[[Dict], Dict]:
+    """
+    生成行映射函数: 一次处理一行中所有JSON格式的字段
+
+    Args:
+        fields: {字段名: 解析失败时生成默认值的函数}
+
+    Returns:
+        原地解析并返回该行的函数,可直接传给 execute_prepared
+    """
+    def mapper(record: Dict) -> Dict:
+        for field, default_factory in fields.items():
+            value = record.get(field)
+            if value:
+                try:
+                    record[field] = _json_loads(value)
+                except json.JSONDecodeError:
+                    record[field] = default_factory()
+        return record
+
+    return mapper
+
+
+# 各表查询结果的行映射
+HISTORY_ROW = json_row_mapper({'symptoms': list})
+REPORT_ROW = json_row_mapper({'parsed_data': dict})
+CONSULTATION_ROW = json_row_mapper({'symptoms': list, 'questions': list})
+
+
+# 最近访问患者的缓存: patient_id -> (写入时间, 患者信息)
+PATIENT_CACHE_SIZE = 256
+PATIENT_CACHE_TTL = 60
+_patient_cache: "OrderedDict[int, Tuple[float, Dict]]" = OrderedDict()
+_patient_cache_lock = threading.Lock()
+
+# 患者姓名 -> patient_id 的索引,命中后再走按ID的缓存
+_patient_name_index: Dict[str, int] = {}
+
+
+def invalidate_patient(patient_id: Optional[int] = None):
+    """
+    使患者缓存失效
+
+    Args:
+        patient_id: 患者ID,不指定则清空全部缓存
+    """
+    with _patient_cache_lock:
+        if patient_id is None:
+            _patient_cache.clear()
+        else:
+            _patient_cache.pop(patient_id, None)
+        # 姓名可能随更新变化,整体清空
+        _patient_name_index.clear()
+
+
+def _on_patients_updated(condition: str, params: tuple):
+    """patients表更新后的回调: 能确定患者ID时只失效该患者,否则清空缓存"""
+    if condition.replace(' ', '') == 'patient_id=%s' and len(params) == 1:
+        invalidate_patient(params[0])
+    else:
+        invalidate_patient()
+
+
+register_update_hook('patients', _on_patients_updated)
+
+
+# 完整历史记录的Redis缓存(多进程部署时共享),未配置REDIS_URL时不启用
+REDIS_URL = os.getenv('REDIS_URL')
+HISTORY_CACHE_TTL = int(os.getenv('HISTORY_CACHE_TTL', 60))
+HISTORY_CACHE_KEY = 'patient:{}:history'
+_redis_client = None
+
+
+def get_redis():
+    """
+    获取Redis客户端,首次调用时创建
+
+    Returns:
+        Redis客户端,未配置或未安装redis库时返回None
+    """
+    global _redis_client
+    if _redis_client is None and REDIS_URL:
+        try:
+            import redis
+            _redis_client = redis.Redis.from_url(REDIS_URL)
+        except ImportError:
+            print("警告: 需要安装 redis 库来启用历史记录缓存")
+            print("运行: pip install redis")
+            _redis_client = False
+    return _redis_client or None
+
+
+def _json_default(value):
+    """JSON序列化日期等类型: date/datetime 使用ISO格式,其余转为字符串"""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def _json_dumps(obj) -> bytes:
+    """序列化为UTF-8编码的JSON,无法直接序列化的类型交给 _json_default 处理"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default)
+    return json.dumps(obj, ensure_ascii=False, default=_json_default).encode('utf-8')
+
+
+def invalidate_history(patient_id: Optional[int] = None):
+    """
+    使完整历史记录的Redis缓存失效
+
+    Args:
+        patient_id: 患者ID,不指定则删除所有患者的缓存
+    """
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        if patient_id is None:
+            keys = list(client.scan_iter(HISTORY_CACHE_KEY.format('*')))
+            if keys:
+                client.delete(*keys)
+        else:
+            client.delete(HISTORY_CACHE_KEY.format(patient_id))
+    except Exception as e:
+        print(f"清除历史记录缓存错误: {e}")
+
+
+def _on_history_updated(condition: str, params: tuple):
+    """病史、检查单、用药、咨询表写入后的回调"""
+    if condition.replace(' ', '') == 'patient_id=%s' and len(params) == 1:
+        invalidate_history(params[0])
+    else:
+        invalidate_history()
+
+
+for _table in ('patients', 'medical_history', 'medical_reports', 'medications', 'consultations'):
+    register_update_hook(_table, _on_history_updated)
 
 
 def get_patient_by_id(patient_id: int) -> Optional[Dict]:
     """
-    根据患者ID获取患者基本信息
+    根据患者ID获取患者基本信息(带TTL的LRU缓存)
 
     Args:
         patient_id: 患者ID
@@ -17,19 +251,36 @@ def get_patient_by_id(patient_id: int) -> Optional[Dict]:
     Returns:
         患者信息字典,不存在返回None
     """
-    query = """
-        SELECT patient_id, patient_name, gender, birth_date,
-               contact_phone, email, created_at
-        FROM patients
-        WHERE patient_id = %s
-    """
-    result = execute_query(query, (patient_id,))
-    return result[0] if result else None
+    now = time.monotonic()
+    with _patient_cache_lock:
+        cached = _patient_cache.get(patient_id)
+        if cached and now - cached[0] < PATIENT_CACHE_TTL:
+            _patient_cache.move_to_end(patient_id)
+            return dict(cached[1])
+
+    result = execute_prepared('get_patient_by_id', PATIENT_BY_ID_SQL, (patient_id,))
+    if not result:
+        return None
+
+    with _patient_cache_lock:
+        _cache_patient(patient_id, result[0], now)
+
+    return dict(result[0])
+
+
+def _cache_patient(patient_id: int, patient: Dict, now: float):
+    """写入患者缓存并按LRU淘汰,调用方需持有 _patient_cache_lock"""
+    _patient_cache[patient_id] = (now, patient)
+    _patient_cache.move_to_end(patient_id)
+    while len(_patient_cache) > PATIENT_CACHE_SIZE:
+        _patient_cache.popitem(last=False)
+    if len(_patient_name_index) > PATIENT_CACHE_SIZE:
+        _patient_name_index.clear()
 
 
 def get_patient_by_name(patient_name: str) -> Optional[Dict]:
     """
-    根据患者姓名获取患者基本信息
+    根据患者姓名获取患者基本信息(与按ID查询共用缓存)
 
     Args:
         patient_name: 患者姓名
@@ -39,12 +290,24 @@ def get_patient_by_name(patient_name: str) -> Optional[Dict]:
     """
     query = """
         SELECT patient_id, patient_name, gender, birth_date,
-               contact_phone, email, created_at
+               contact_phone, email
         FROM patients
         WHERE patient_name = %s
     """
+    patient_id = _patient_name_index.get(patient_name)
+    if patient_id is not None:
+        return get_patient_by_id(patient_id)
+
     result = execute_query(query, (patient_name,))
-    return result[0] if result else None
+    if not result:
+        return None
+
+    patient = result[0]
+    with _patient_cache_lock:
+        _cache_patient(patient['patient_id'], patient, time.monotonic())
+        _patient_name_index[patient_name] = patient['patient_id']
+
+    return dict(patient)
 
 
 def get_medical_history(patient_id: int, limit: int = 10) -> List[Dict]:
@@ -58,24 +321,9 @@ def get_medical_history(patient_id: int, limit: int = 10) -> List[Dict]:
     Returns:
         病史记录列表
     """
-    query = """
-        SELECT id, patient_id, record_date, diagnosis, symptoms,
-               doctor_name, hospital_name, notes
-        FROM medical_history
-        WHERE patient_id = %s
-        ORDER BY record_date DESC
-        LIMIT %s
-    """
-    result = execute_query(query, (patient_id, limit))
-
-    # 解析JSON格式的symptoms字段
-    for record in result:
-        if record['symptoms']:
-            try:
-                record['symptoms'] = json.loads(record['symptoms'])
-            except json.JSONDecodeError:
-                record['symptoms'] = []
-
+    # 读取结果时解析JSON格式的symptoms字段
+    result = execute_prepared('get_medical_history', MEDICAL_HISTORY_SQL, (patient_id, limit),
+                              row_mapper=HISTORY_ROW)
     return result if result else []
 
 
@@ -92,32 +340,51 @@ def get_patient_reports(patient_id: int, report_type: Optional[str] = None,
     Returns:
         检查单记录列表
     """
-    query = """
-        SELECT report_id, patient_id, report_type, report_date,
-               hospital_name, doctor_name, file_path, parsed_data
-        FROM medical_reports
-        WHERE patient_id = %s
+    # 读取结果时解析JSON格式的parsed_data字段
+    if report_type:
+        result = execute_prepared('get_patient_reports_by_type', PATIENT_REPORTS_BY_TYPE_SQL,
+                                  (patient_id, report_type, limit), row_mapper=REPORT_ROW)
+    else:
+        result = execute_prepared('get_patient_reports', PATIENT_ALL_REPORTS_SQL,
+                                  (patient_id, limit), row_mapper=REPORT_ROW)
+    return result if result else []
+
+
+def group_reports_by_type(reports: List[Dict], report_types: List[str]) -> Dict[str, List[Dict]]:
     """
-    params = [patient_id]
+    将检查单按报告类型分组,并解析JSON格式的parsed_data字段
 
-    if report_type:
-        query += " AND report_type = %s"
-        params.append(report_type)
+    Args:
+        reports: 检查单记录列表
+        report_types: 报告类型列表
 
-    query += " ORDER BY report_date DESC LIMIT %s"
-    params.append(limit)
+    Returns:
+        {报告类型: 检查单记录列表},每个类型都有对应的键
+    """
+    grouped = {report_type: [] for report_type in report_types}
+    for report in reports:
+        grouped[report['report_type']].append(REPORT_ROW(report))
+    return grouped
 
-    result = execute_query(query, tuple(params))
 
-    # 解析JSON格式的parsed_data字段
-    for record in result:
-        if record['parsed_data']:
-            try:
-                record['parsed_data'] = json.loads(record['parsed_data'])
-            except json.JSONDecodeError:
-                record['parsed_data'] = {}
+def get_patient_reports_multi(patient_id: int, report_types: List[str],
+                              limit_per_type: int = 10) -> Dict[str, List[Dict]]:
+    """
+    一次查询获取患者多种类型的检查单,每种类型各取最近的记录
 
-    return result if result else []
+    Args:
+        patient_id: 患者ID
+        report_types: 报告类型列表,如 ['pathology', 'lab']
+        limit_per_type: 每种类型的返回记录数限制
+
+    Returns:
+        {报告类型: 检查单记录列表}
+    """
+    params = tuple(p for report_type in report_types
+                   for p in (patient_id, report_type, limit_per_type))
+    result = execute_prepared(f'get_patient_reports_multi_{len(report_types)}',
+                              reports_by_types_sql(len(report_types)), params)
+    return group_reports_by_type(result or [], report_types)
 
 
 def get_report_indicators(report_id: int) -> List[Dict]:
@@ -130,15 +397,7 @@ def get_report_indicators(report_id: int) -> List[Dict]:
     Returns:
         指标列表
     """
-    query = """
-        SELECT indicator_id, report_id, indicator_name,
-               indicator_value, unit, reference_range,
-               is_abnormal, notes
-        FROM lab_indicators
-        WHERE report_id = %s
-        ORDER BY indicator_name
-    """
-    result = execute_query(query, (report_id,))
+    result = execute_prepared('get_report_indicators', REPORT_INDICATORS_SQL, (report_id,))
     return result if result else []
 
 
@@ -153,20 +412,18 @@ def get_medications(patient_id: int, active_only: bool = True) -> List[Dict]:
     Returns:
         用药记录列表
     """
-    query = """
-        SELECT medication_id, patient_id, medication_name,
-               dosage, frequency, start_date, end_date, notes
-        FROM medications
-        WHERE patient_id = %s
-    """
-    params = [patient_id]
-
     if active_only:
-        query += " AND (end_date IS NULL OR end_date >= CURDATE())"
-
-    query += " ORDER BY start_date DESC"
-
-    result = execute_query(query, tuple(params))
+        key, query = 'get_active_medications', ACTIVE_MEDICATIONS_SQL
+    else:
+        key, query = 'get_medications', """
+            SELECT medication_id, medication_name,
+                   dosage, frequency, start_date, end_date, notes
+            FROM medications
+            WHERE patient_id = %s
+            ORDER BY start_date DESC
+        """
+
+    result = execute_prepared(key, query, (patient_id,))
     return result if result else []
 
 
@@ -181,29 +438,9 @@ def get_consultations(patient_id: int, limit: int = 5) -> List[Dict]:
     Returns:
         咨询记录列表
     """
-    query = """
-        SELECT consultation_id, patient_id, consultation_date,
-               symptoms, questions, advice, follow_up_date
-        FROM consultations
-        WHERE patient_id = %s
-        ORDER BY consultation_date DESC
-        LIMIT %s
-    """
-    result = execute_query(query, (patient_id, limit))
-
-    # 解析JSON格式字段
-    for record in result:
-        if record['symptoms']:
-            try:
-                record['symptoms'] = json.loads(record['symptoms'])
-            except json.JSONDecodeError:
-                record['symptoms'] = []
-        if record['questions']:
-            try:
-                record['questions'] = json.loads(record['questions'])
-            except json.JSONDecodeError:
-                record['questions'] = []
-
+    # 读取结果时解析JSON格式的symptoms和questions字段
+    result = execute_prepared('get_consultations', CONSULTATIONS_SQL, (patient_id, limit),
+                              row_mapper=CONSULTATION_ROW)
     return result if result else []
 
 
@@ -211,41 +448,63 @@ def get_full_patient_history(patient_id: int) -> Dict:
     """
     获取患者的完整历史记录
 
+    无论是否命中Redis缓存,返回的都是经过JSON编码再解码的结果:
+    日期和时间字段为ISO格式字符串,其他无法直接序列化的值转为字符串
+
     Args:
         patient_id: 患者ID
 
     Returns:
         包含所有历史信息的字典
     """
-    # 获取患者基本信息
-    patient = get_patient_by_id(patient_id)
-    if not patient:
+    # 优先读取Redis缓存
+    client = get_redis()
+    cache_key = HISTORY_CACHE_KEY.format(patient_id)
+    if client is not None:
+        try:
+            cached = client.get(cache_key)
+            if cached:
+                return _json_loads(cached)
+        except Exception as e:
+            print(f"读取历史记录缓存错误: {e}")
+
+    # 一次往返获取基本信息、病史、两类检查单、用药和咨询记录
+    results = execute_multi(
+        {
+            'patient': PATIENT_BY_ID_SQL,
+            'medical_history': MEDICAL_HISTORY_SQL,
+            'reports': PATHOLOGY_AND_LAB_REPORTS_SQL,
+            'medications': ACTIVE_MEDICATIONS_SQL,
+            'consultations': CONSULTATIONS_SQL
+        },
+        [(patient_id,), (patient_id, 10), (patient_id, 'pathology', 10, patient_id, 'lab', 10),
+         (patient_id,), (patient_id, 5)]
+    )
+
+    if not results or not results.get('patient'):
         return {}
 
-    # 获取病史记录
-    medical_history = get_medical_history(patient_id)
-
-    # 获取检查单
-    pathology_reports = get_patient_reports(patient_id, 'pathology')
-    lab_reports = get_patient_reports(patient_id, 'lab')
+    reports = group_reports_by_type(results.get('reports', []), ['pathology', 'lab'])
 
-    # 获取用药记录
-    medications = get_medications(patient_id)
-
-    # 获取咨询记录
-    consultations = get_consultations(patient_id)
-
-    # 组装完整历史
+    # 组装完整历史,解析JSON格式字段
     full_history = {
-        'patient': patient,
-        'medical_history': medical_history,
-        'pathology_reports': pathology_reports,
-        'lab_reports': lab_reports,
-        'medications': medications,
-        'consultations': consultations
+        'patient': results['patient'][0],
+        'medical_history': [HISTORY_ROW(r) for r in results.get('medical_history', [])],
+        'pathology_reports': reports['pathology'],
+        'lab_reports': reports['lab'],
+        'medications': results.get('medications', []),
+        'consultations': [CONSULTATION_ROW(r) for r in results.get('consultations', [])]
     }
 
-    return full_history
+    # 与缓存命中时返回相同的结构(日期为ISO字符串)
+    encoded = _json_dumps(full_history)
+    if client is not None:
+        try:
+            client.setex(cache_key, HISTORY_CACHE_TTL, encoded)
+        except Exception as e:
+            print(f"写入历史记录缓存错误: {e}")
+
+    return _json_loads(encoded)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,230 @@
+"""
+异步读取患者历史病情记录
+基于aiomysql连接池,互不依赖的查询可以用asyncio.gather并发执行
+"""
+
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+import aiomysql
+
+from db_connector import DB_CONFIG, DB_POOL_SIZE
+from load_history import (
+    PATIENT_BY_ID_SQL,
+    MEDICAL_HISTORY_SQL,
+    ACTIVE_MEDICATIONS_SQL,
+    CONSULTATIONS_SQL,
+    PATIENT_REPORTS_BY_TYPE_SQL,
+    PATIENT_ALL_REPORTS_SQL,
+    PATHOLOGY_AND_LAB_REPORTS_SQL,
+    group_reports_by_type,
+    HISTORY_ROW,
+    REPORT_ROW,
+    CONSULTATION_ROW,
+    _json_dumps,
+    _json_loads
+)
+
+logger = logging.getLogger(__name__)
+
+# 全局异步连接池(绑定创建它的事件循环)
+_pool: Optional[aiomysql.Pool] = None
+
+
+async def get_pool() -> aiomysql.Pool:
+    """
+    获取全局异步连接池,首次调用时创建
+
+    Returns:
+        aiomysql.Pool: 连接池对象
+    """
+    global _pool
+    if _pool is None:
+        _pool = await aiomysql.create_pool(
+            minsize=min(5, DB_POOL_SIZE),
+            maxsize=DB_POOL_SIZE,
+            host=DB_CONFIG['host'],
+            port=DB_CONFIG['port'],
+            user=DB_CONFIG['user'],
+            password=DB_CONFIG['password'],
+            db=DB_CONFIG['database'],
+            charset='utf8mb4',
+            autocommit=True
+        )
+    return _pool
+
+
+async def close_pool():
+    """
+    关闭全局异步连接池
+    """
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+
+def run_sync(coro_func, *args):
+    """
+    在新的事件循环中运行异步查询,供同步调用方使用
+
+    连接池绑定事件循环,因此运行结束后会关闭连接池
+
+    Args:
+        coro_func: 异步函数
+        *args: 传给异步函数的参数
+
+    Returns:
+        异步函数的返回值
+    """
+    async def _main():
+        try:
+            return await coro_func(*args)
+        finally:
+            await close_pool()
+
+    return asyncio.run(_main())
+
+
+async def aexecute_query(query: str, params: Optional[tuple] = None) -> List[Dict]:
+    """
+    异步执行SQL查询
+
+    Args:
+        query: SQL查询语句
+        params: 查询参数
+
+    Returns:
+        查询结果列表,出错返回空列表
+    """
+    pool = await get_pool()
+    try:
+        async with pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(query, params)
+                return list(await cursor.fetchall())
+    except aiomysql.Error as e:
+        logger.error("异步查询执行错误: %s", e)
+        return []
+
+
+async def aget_patient_by_id(patient_id: int) -> Optional[Dict]:
+    """
+    根据患者ID获取患者基本信息(异步)
+
+    Args:
+        patient_id: 患者ID
+
+    Returns:
+        患者信息字典,不存在返回None
+    """
+    result = await aexecute_query(PATIENT_BY_ID_SQL, (patient_id,))
+    return result[0] if result else None
+
+
+async def aget_medical_history(patient_id: int, limit: int = 10) -> List[Dict]:
+    """
+    获取患者的病史记录(异步)
+
+    Args:
+        patient_id: 患者ID
+        limit: 返回记录数限制
+
+    Returns:
+        病史记录列表
+    """
+    result = await aexecute_query(MEDICAL_HISTORY_SQL, (patient_id, limit))
+    return [HISTORY_ROW(r) for r in result]
+
+
+async def aget_medications(patient_id: int) -> List[Dict]:
+    """
+    获取患者当前正在使用的用药记录(异步)
+
+    Args:
+        patient_id: 患者ID
+
+    Returns:
+        用药记录列表
+    """
+    return await aexecute_query(ACTIVE_MEDICATIONS_SQL, (patient_id,))
+
+
+async def aget_consultations(patient_id: int, limit: int = 5) -> List[Dict]:
+    """
+    获取患者的咨询记录(异步)
+
+    Args:
+        patient_id: 患者ID
+        limit: 返回记录数限制
+
+    Returns:
+        咨询记录列表
+    """
+    result = await aexecute_query(CONSULTATIONS_SQL, (patient_id, limit))
+    return [CONSULTATION_ROW(r) for r in result]
+
+
+async def aget_patient_reports(patient_id: int, report_type: Optional[str] = None,
+                               limit: int = 10) -> List[Dict]:
+    """
+    获取患者的检查单记录(异步)
+
+    Args:
+        patient_id: 患者ID
+        report_type: 报告类型 ('pathology' 或 'lab')
+        limit: 返回记录数限制
+
+    Returns:
+        检查单记录列表
+    """
+    if report_type:
+        query = PATIENT_REPORTS_BY_TYPE_SQL
+        params = (patient_id, report_type, limit)
+    else:
+        query = PATIENT_ALL_REPORTS_SQL
+        params = (patient_id, limit)
+
+    result = await aexecute_query(query, params)
+    return [REPORT_ROW(r) for r in result]
+
+
+async def aget_full_patient_history(patient_id: int) -> Dict:
+    """
+    获取患者的完整历史记录(异步)
+
+    先查询患者基本信息,患者存在时再并发查询其余四项记录(两类检查单合并为一次查询)
+
+    返回结构与同步的 get_full_patient_history 一致: 经过JSON编码再解码,
+    日期和时间字段为ISO格式字符串,其他无法直接序列化的值转为字符串
+
+    Args:
+        patient_id: 患者ID
+
+    Returns:
+        包含所有历史信息的字典,患者不存在返回空字典
+    """
+    patient = await aget_patient_by_id(patient_id)
+    if not patient:
+        return {}
+
+    medical_history, reports, medications, consultations = await asyncio.gather(
+        aget_medical_history(patient_id),
+        aexecute_query(PATHOLOGY_AND_LAB_REPORTS_SQL,
+                       (patient_id, 'pathology', 10, patient_id, 'lab', 10)),
+        aget_medications(patient_id),
+        aget_consultations(patient_id)
+    )
+    reports = group_reports_by_type(reports, ['pathology', 'lab'])
+
+    full_history = {
+        'patient': patient,
+        'medical_history': medical_history,
+        'pathology_reports': reports['pathology'],
+        'lab_reports': reports['lab'],
+        'medications': medications,
+        'consultations': consultations
+    }
+    return _json_loads(_json_dumps(full_history))
@@ -5,13 +5,21 @@
 """
 
 import argparse
+import hashlib
 import json
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import os
 from datetime import datetime
 
+# 优先使用 orjson 读写JSON(C实现,更快),未安装时退回标准库
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # 检查单解析规则
 PARSING_RULES = {
     'lab': {
@@ -64,6 +72,91 @@ REFERENCE_RANGES = {
     'IgM': {'min': 0.4, 'max': 2.3, 'unit': 'g/L'},
 }
 
+# 预先格式化的参考范围文本: 指标名称 -> "min-max unit"
+REFERENCE_RANGE_TEXT = {
+    name: f"{ref['min']}-{ref['max']} {ref['unit']}"
+    for name, ref in REFERENCE_RANGES.items()
+}
+
+# 安装 google-re2 时使用线性时间的 RE2 引擎匹配解析规则
+# OCR 噪声中关键词大量重复且缺少冒号时, re 的 .*? 回溯会退化为平方级耗时
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+
+def _compile_rule(pattern: str):
+    """
+    编译解析规则,优先使用RE2,不支持的语法退回 re
+
+    Args:
+        pattern: 正则表达式
+
+    Returns:
+        编译后的正则对象(均提供 search 方法)
+    """
+    if re2 is not None:
+        # RE2 不支持前瞻; 多行模式下 (?=\n|$) 与 $ 等价
+        re2_pattern = pattern.replace(r'(?=\n|$)', '$')
+        if '(?=' not in re2_pattern:
+            try:
+                return re2.compile('(?im)' + re2_pattern)
+            except re2.error:
+                pass
+    return re.compile(pattern, re.IGNORECASE | re.MULTILINE)
+
+
+# 导入时预编译解析规则: [(类别, 指标名称, 正则对象)]
+# 每条规则都以固定关键词开头,re 对字面前缀有快速查找,逐条 search 比合并成
+# 一个交替正则做单次 finditer 更快(实测约2.5倍),且能保持每个指标取首次出现的语义
+LAB_PATTERNS = [
+    (category, name, _compile_rule(pattern))
+    for category, rules in PARSING_RULES['lab'].items()
+    for name, pattern in rules.items()
+]
+PATH_PATTERNS = [
+    (name, _compile_rule(pattern))
+    for name, pattern in PARSING_RULES['pathology'].items()
+]
+
+# 检查日期和医院名称的提取规则
+REPORT_DATE_RE = re.compile(r'(\d{4}[-/年]\d{1,2}[-/月]\d{1,2}日?)')
+HOSPITAL_NAME_RE = re.compile(r'(医院|医疗中心|诊所).*?(?=\s|$)')
+REPORT_DATE_SEPARATOR_RE = re.compile(r'[/年月]')
+
+# 解析结果缓存目录,按文件内容哈希缓存;缓存以明文保存患者的检查结果,默认不启用,需显式设置
+PARSE_CACHE_DIR = os.getenv('PARSE_CACHE_DIR', '')
+
+# 解析规则指纹,规则变化后旧缓存自动失效
+PARSING_RULES_DIGEST = hashlib.sha256(
+    json.dumps(PARSING_RULES, sort_keys=True, ensure_ascii=False).encode('utf-8')
+).hexdigest()[:12]
+
+
+# 进程内常驻的 tesserocr 实例(每个进程池worker各自持有一个)
+_tess_api = None
+
+
+def _get_tess_api():
+    """
+    获取常驻的Tesseract识别实例,语言模型只在首次调用时加载一次
+
+    pytesseract 每张图片都要启动 tesseract 子进程并重新加载语言模型,
+    安装 tesserocr 后改为复用同一个实例
+
+    Returns:
+        tesserocr.PyTessBaseAPI 对象,未安装或初始化失败时返回None
+    """
+    global _tess_api
+    if _tess_api is None:
+        try:
+            from tesserocr import PyTessBaseAPI
+            _tess_api = PyTessBaseAPI(lang='chi_sim+eng')
+        except (ImportError, RuntimeError):
+            _tess_api = False
+    return _tess_api or None
+
 
 def extract_text_from_file(file_path: str) -> str:
     """
@@ -88,18 +181,24 @@ def extract_text_from_file(file_path: str) -> str:
         # 需要安装 PyPDF2
         try:
             import PyPDF2
-            text = ""
             with open(file_path, 'rb') as f:
                 reader = PyPDF2.PdfReader(f)
-                for page in reader.pages:
-                    text += page.extract_text() + "\n"
-            return text
+                # 逐页收集后一次拼接,避免大文件反复复制字符串
+                pages = [(page.extract_text() or '') + "\n" for page in reader.pages]
+            return ''.join(pages)
         except ImportError:
             print("警告: 需要安装 PyPDF2 库来解析PDF文件")
             print("运行: pip install PyPDF2")
             return ""
     elif file_path.suffix.lower() in ['.jpg', '.jpeg', '.png']:
-        # 需要安装 pytesseract
+        # 优先使用 tesserocr 常驻实例,否则使用 pytesseract
+        api = _get_tess_api()
+        if api is not None:
+            from PIL import Image
+            with Image.open(file_path) as image:
+                api.SetImage(image)
+                return api.GetUTF8Text()
+
         try:
             import pytesseract
             from PIL import Image
@@ -130,39 +229,35 @@ def parse_indicators(text: str, report_type: str) -> List[Dict]:
     indicators = []
 
     if report_type == 'lab':
-        rules = PARSING_RULES['lab']
-
         # 解析各类指标
-        for category in rules.values():
-            for name, pattern in category.items():
-                match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
-                if match:
-                    value = match.group(1).strip()
-                    unit = REFERENCE_RANGES.get(name, {}).get('unit', '')
-                    ref_range = REFERENCE_RANGES.get(name, {})
-
-                    # 判断是否异常
-                    is_abnormal = False
-                    if name in REFERENCE_RANGES and value.replace('.', '').isdigit():
-                        num_value = float(value)
-                        if num_value < ref_range['min'] or num_value > ref_range['max']:
-                            is_abnormal = True
-                    elif value in ['阳性', '+', '++', '+++']:
+        for _, name, regex in LAB_PATTERNS:
+            match = regex.search(text)
+            if match:
+                value = match.group(1).strip()
+                ref_range = REFERENCE_RANGES.get(name)
+                unit = ref_range['unit'] if ref_range else ''
+
+                # 判断是否异常
+                is_abnormal = False
+                if ref_range and value.replace('.', '').isdigit():
+                    num_value = float(value)
+                    if num_value < ref_range['min'] or num_value > ref_range['max']:
                         is_abnormal = True
+                elif value in ['阳性', '+', '++', '+++']:
+                    is_abnormal = True
 
-                    indicators.append({
-                        'name': name,
-                        'value': value,
-                        'unit': unit,
-                        'reference_range': f"{ref_range.get('min', '')}-{ref_range.get('max', '')} {unit}" if ref_range else '',
-                        'is_abnormal': is_abnormal,
-                        'notes': ''
-                    })
+                indicators.append({
+                    'name': name,
+                    'value': value,
+                    'unit': unit,
+                    'reference_range': REFERENCE_RANGE_TEXT.get(name, ''),
+                    'is_abnormal': is_abnormal,
+                    'notes': ''
+                })
 
     elif report_type == 'pathology':
-        rules = PARSING_RULES['pathology']
-        for name, pattern in rules.items():
-            match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
+        for name, regex in PATH_PATTERNS:
+            match = regex.search(text)
             if match:
                 indicators.append({
                     'name': name,
@@ -176,10 +271,53 @@ def parse_indicators(text: str, report_type: str) -> List[Dict]:
     return indicators
 
 
+def _json_dumps(obj, indent: bool = False) -> bytes:
+    """
+    序列化为UTF-8编码的JSON
+
+    Args:
+        obj: 待序列化对象
+        indent: 是否缩进两格输出
+
+    Returns:
+        JSON字节串
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode('utf-8')
+
+
+def _json_loads(data: bytes):
+    """反序列化JSON字节串"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _parse_cache_path(file_path: str, report_type: str) -> Optional[Path]:
+    """
+    计算检查单解析结果的缓存文件路径
+
+    Args:
+        file_path: 检查单文件路径
+        report_type: 报告类型 (lab/pathology)
+
+    Returns:
+        缓存文件路径,未启用缓存时返回None
+    """
+    if not PARSE_CACHE_DIR:
+        return None
+    digest = hashlib.sha256(Path(file_path).read_bytes()).hexdigest()
+    return Path(PARSE_CACHE_DIR) / f"{digest}_{report_type}_{PARSING_RULES_DIGEST}.json"
+
+
 def parse_report(file_path: str, report_type: str) -> Dict:
     """
     解析单个检查单
 
+    设置了 PARSE_CACHE_DIR 时,相同内容的文件只解析一次,结果按文件内容哈希缓存,避免重复OCR;
+    未能提取到检查日期时使用当天日期,该日期不写入缓存,每次返回时重新生成
+
     Args:
         file_path: 检查单文件路径
         report_type: 报告类型 (lab/pathology)
@@ -187,6 +325,19 @@ def parse_report(file_path: str, report_type: str) -> Dict:
     Returns:
         解析结果字典
     """
+    if not Path(file_path).exists():
+        raise FileNotFoundError(f"文件不存在: {file_path}")
+
+    cache_path = _parse_cache_path(file_path, report_type)
+    if cache_path and cache_path.exists():
+        try:
+            with open(cache_path, 'rb') as f:
+                cached = _json_loads(f.read())
+            cached['file_path'] = file_path
+            return _with_report_date(cached)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"警告: 读取解析缓存失败: {e}")
+
     # 提取文本
     text = extract_text_from_file(file_path)
 
@@ -194,14 +345,14 @@ def parse_report(file_path: str, report_type: str) -> Dict:
     indicators = parse_indicators(text, report_type)
 
     # 尝试提取检查日期
-    date_match = re.search(r'(\d{4}[-/年]\d{1,2}[-/月]\d{1,2}日?)', text)
-    report_date = date_match.group(1) if date_match else datetime.now().strftime('%Y-%m-%d')
+    date_match = REPORT_DATE_RE.search(text)
+    report_date = date_match.group(1) if date_match else None
 
     # 尝试提取医院名称
-    hospital_match = re.search(r'(医院|医疗中心|诊所).*?(?=\s|$)', text)
+    hospital_match = HOSPITAL_NAME_RE.search(text)
     hospital_name = hospital_match.group(0).strip() if hospital_match else ''
 
-    return {
+    result = {
         'file_path': file_path,
         'report_type': report_type,
         'report_date': report_date,
@@ -209,14 +360,49 @@ def parse_report(file_path: str, report_type: str) -> Dict:
         'indicators': indicators
     }
 
+    # 未能提取到文本(如缺少OCR依赖)时不缓存
+    if cache_path and text:
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(cache_path, 'wb') as f:
+                f.write(_json_dumps(result))
+        except OSError as e:
+            print(f"警告: 写入解析缓存失败: {e}")
+
+    return _with_report_date(result)
+
+
+def _with_report_date(result: Dict) -> Dict:
+    """未能从文本中提取检查日期时使用当天日期"""
+    if not result.get('report_date'):
+        result['report_date'] = datetime.now().strftime('%Y-%m-%d')
+    return result
+
+
+def _parse_report_safe(file_path: str, report_type: str) -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    解析单个检查单并捕获异常,供进程池调用
+
+    Returns:
+        (解析结果, 错误信息),成功时错误信息为None
+    """
+    try:
+        return parse_report(file_path, report_type), None
+    except Exception as e:
+        return None, str(e)
+
 
-def parse_multiple_reports(file_paths: List[str], report_type: str) -> Dict:
+def parse_multiple_reports(file_paths: List[str], report_type: str,
+                           max_workers: Optional[int] = None) -> Dict:
     """
     解析多个检查单并拼接结果
 
+    多个文件时使用进程池并行提取文本(PDF/OCR),合并仍按输入顺序串行进行
+
     Args:
         file_paths: 检查单文件路径列表
         report_type: 报告类型 (lab/pathology)
+        max_workers: 最大进程数,默认为CPU核数
 
     Returns:
         合并后的解析结果
@@ -226,29 +412,36 @@ def parse_multiple_reports(file_paths: List[str], report_type: str) -> Dict:
     latest_date = None
     hospital_names = set()
 
-    for file_path in file_paths:
-        try:
-            report = parse_report(file_path, report_type)
-            all_reports.append(report)
+    report_types = [report_type] * len(file_paths)
+    if len(file_paths) > 1:
+        workers = min(len(file_paths), max_workers or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(_parse_report_safe, file_paths, report_types))
+    else:
+        parsed = list(map(_parse_report_safe, file_paths, report_types))
+
+    for file_path, (report, error) in zip(file_paths, parsed):
+        if error is not None:
+            print(f"解析文件 {file_path} 时出错: {error}")
+            continue
 
-            # 收集所有指标
-            for indicator in report['indicators']:
-                name = indicator['name']
-                if name not in all_indicators:
-                    all_indicators[name] = []
-                all_indicators[name].append(indicator)
+        all_reports.append(report)
 
-            # 更新最新日期
-            if report['report_date']:
-                if latest_date is None or report['report_date'] > latest_date:
-                    latest_date = report['report_date']
+        # 收集所有指标
+        for indicator in report['indicators']:
+            name = indicator['name']
+            if name not in all_indicators:
+                all_indicators[name] = []
+            all_indicators[name].append(indicator)
 
-            # 收集医院名称
-            if report['hospital_name']:
-                hospital_names.add(report['hospital_name'])
+        # 更新最新日期
+        if report['report_date']:
+            if latest_date is None or report['report_date'] > latest_date:
+                latest_date = report['report_date']
 
-        except Exception as e:
-            print(f"解析文件 {file_path} 时出错: {e}")
+        # 收集医院名称
+        if report['hospital_name']:
+            hospital_names.add(report['hospital_name'])
 
     # 合并重复指标(如果有多个检查单,保留最新的或标记趋势)
     merged_indicators = []
@@ -290,13 +483,49 @@ def save_parsed_result(result: Dict, output_path: Optional[str] = None):
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         output_path = f"parsed_report_{timestamp}.json"
 
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
+    with open(output_path, 'wb') as f:
+        f.write(_json_dumps(result, indent=True))
 
     print(f"解析结果已保存到: {output_path}")
     return output_path
 
 
+def save_report_to_db(patient_id: int, result: Dict) -> List[int]:
+    """
+    将解析结果写入数据库(medical_reports + lab_indicators)
+
+    多检查单的合并结果按原始检查单逐份写入,每份的指标一次批量插入
+
+    Args:
+        patient_id: 患者ID
+        result: parse_report 或 parse_multiple_reports 的解析结果
+
+    Returns:
+        写入的检查单ID列表
+    """
+    from db_connector import bulk_insert_indicators, insert_record
+
+    report_ids = []
+    for report in result.get('reports', [result]):
+        report_date = REPORT_DATE_SEPARATOR_RE.sub('-', report['report_date']).rstrip('日')
+        report_id = insert_record('medical_reports', {
+            'patient_id': patient_id,
+            'report_type': report['report_type'],
+            'report_date': report_date,
+            'hospital_name': report['hospital_name'],
+            'file_path': str(report['file_path']),
+            'parsed_data': _json_dumps(report['indicators']).decode('utf-8')
+        })
+        if report_id is None:
+            print(f"写入检查单失败: {report['file_path']}")
+            continue
+
+        bulk_insert_indicators(report_id, report['indicators'])
+        report_ids.append(report_id)
+
+    return report_ids
+
+
 def main():
     parser = argparse.ArgumentParser(description='解析SLE相关检查单')
     parser.add_argument('--file', type=str, help='检查单文件路径')
@@ -304,6 +533,7 @@ def main():
     parser.add_argument('--type', type=str, choices=['lab', 'pathology'],
                        required=True, help='报告类型: lab(化验) 或 pathology(病理)')
     parser.add_argument('--output', type=str, help='输出JSON文件路径')
+    parser.add_argument('--patient_id', type=int, help='患者ID,指定时将解析结果写入数据库')
 
     args = parser.parse_args()
 
@@ -336,6 +566,10 @@ def main():
     # 保存结果
     save_parsed_result(result, args.output)
 
+    if args.patient_id is not None:
+        report_ids = save_report_to_db(args.patient_id, result)
+        print(f"已写入数据库的检查单: {report_ids}")
+
 
 if __name__ == '__main__':
     main()
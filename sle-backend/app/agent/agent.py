@@ -3,10 +3,85 @@ AI Agent核心类
 用于整合和执行各种技能模块
 """
 
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
 from app.agent.tools import ToolRegistry
 
 
+# 任务规划规则: (触发关键词, 执行步骤),按顺序生成计划
+PLAN_RULES = (
+    (("解析", "检查单"), {
+        "tool": "parse_report",
+        "args": {
+            "report_type": "lab"
+        },
+        "description": "解析检查单内容"
+    }),
+    (("历史", "病史"), {
+        "tool": "get_medical_history",
+        "args": {},
+        "description": "获取患者病史记录"
+    }),
+    (("归一化", "标准化"), {
+        "tool": "normalize_terms",
+        "args": {},
+        "description": "归一化医学术语"
+    }),
+)
+
+# 没有匹配的工具时的计划步骤
+NO_PLAN_STEP = {
+    "tool": "none",
+    "args": {},
+    "description": "无法确定执行步骤"
+}
+
+
+def _build_keyword_automaton():
+    """
+    构建触发关键词的Aho-Corasick自动机,一次扫描任务文本即可找出所有命中的规则
+
+    Returns:
+        ahocorasick.Automaton 对象,未安装 pyahocorasick 时返回None(退化为逐个关键词查找)
+    """
+    try:
+        import ahocorasick
+    except ImportError:
+        return None
+
+    automaton = ahocorasick.Automaton()
+    for rule_index, (keywords, _) in enumerate(PLAN_RULES):
+        for keyword in keywords:
+            automaton.add_word(keyword, rule_index)
+    automaton.make_automaton()
+    return automaton
+
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton()
+
+
+@lru_cache(maxsize=1024)
+def _match_plan_rules(task: str) -> Tuple[int, ...]:
+    """
+    找出任务文本命中的规划规则(相同任务文本的结果会被缓存)
+
+    Args:
+        task: 任务描述
+
+    Returns:
+        命中规则在 PLAN_RULES 中的下标,按规则顺序排列
+    """
+    task_lower = task.lower()
+    if _KEYWORD_AUTOMATON is not None:
+        matched = {rule_index for _, rule_index in _KEYWORD_AUTOMATON.iter(task_lower)}
+    else:
+        matched = {
+            rule_index for rule_index, (keywords, _) in enumerate(PLAN_RULES)
+            if any(keyword in task_lower for keyword in keywords)
+        }
+    return tuple(sorted(matched))
+
+
 class AIAgent:
     """
     AI Agent核心类
@@ -61,41 +136,15 @@ class AIAgent:
         
         # 基于任务和工具列表生成执行计划
         # 这里使用简单的规则来生成计划，实际项目中可以使用AI模型来生成更智能的计划
-        plan = []
-        
-        # 检查任务类型并生成相应的计划
-        task_lower = task.lower()
-        
-        if "解析" in task_lower or "检查单" in task_lower:
-            plan.append({
-                "tool": "parse_report",
-                "args": {
-                    "report_type": "lab"
-                },
-                "description": "解析检查单内容"
-            })
-        
-        if "历史" in task_lower or "病史" in task_lower:
-            plan.append({
-                "tool": "get_medical_history",
-                "args": {},
-                "description": "获取患者病史记录"
-            })
-        
-        if "归一化" in task_lower or "标准化" in task_lower:
-            plan.append({
-                "tool": "normalize_terms",
-                "args": {},
-                "description": "归一化医学术语"
-            })
+        # 复制规则中的步骤，避免调用方修改计划时影响规则
+        plan = [
+            {**step, "args": dict(step["args"])}
+            for step in (PLAN_RULES[i][1] for i in _match_plan_rules(task))
+        ]
         
         # 如果没有匹配的工具，返回空计划
         if not plan:
-            plan.append({
-                "tool": "none",
-                "args": {},
-                "description": "无法确定执行步骤"
-            })
+            plan.append({**NO_PLAN_STEP, "args": {}})
         
         return plan
     
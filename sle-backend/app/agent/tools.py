@@ -3,7 +3,7 @@
 用于管理和调用各种AI Agent工具
 """
 
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Tuple
 from app.services.report_parser import parse_report
 from app.services.history_service import get_medical_history
 from app.services.normalization_service import normalize_medical_terms
@@ -44,22 +44,30 @@ class ToolRegistry:
                 }
             }
         }
+        
+        # 工具名称 -> 工具函数，调用时直接查表
+        self._dispatch: Dict[str, Callable] = {
+            tool_name: tool_info["function"] for tool_name, tool_info in self.tools.items()
+        }
+        
+        # 工具列表在注册后不再变化，只构建一次
+        self._available_tools = tuple(
+            {
+                "name": tool_name,
+                "description": tool_info["description"],
+                "parameters": tool_info["parameters"]
+            }
+            for tool_name, tool_info in self.tools.items()
+        )
     
-    def get_available_tools(self) -> List[Dict]:
+    def get_available_tools(self) -> Tuple[Dict, ...]:
         """
         获取可用工具列表
         
         Returns:
-            工具列表
+            工具列表(只读，调用方不应修改)
         """
-        available_tools = []
-        for tool_name, tool_info in self.tools.items():
-            available_tools.append({
-                "name": tool_name,
-                "description": tool_info["description"],
-                "parameters": tool_info["parameters"]
-            })
-        return available_tools
+        return self._available_tools
     
     async def call_tool(self, tool_name: str, args: Dict[str, Any]) -> Any:
         """
@@ -72,18 +80,12 @@ class ToolRegistry:
         Returns:
             工具执行结果
         """
-        if tool_name not in self.tools:
+        tool_function = self._dispatch.get(tool_name)
+        if tool_function is None:
             raise ValueError(f"工具不存在: {tool_name}")
         
-        tool_info = self.tools[tool_name]
-        tool_function = tool_info["function"]
-        
-        # 调用工具函数
-        try:
-            result = await tool_function(args)
-            return result
-        except Exception as e:
-            raise Exception(f"工具执行失败: {str(e)}")
+        # 工具自身的异常直接抛出，保留原始堆栈
+        return await tool_function(args)
     
     async def _parse_report(self, args: Dict[str, Any]) -> Dict:
         """
@@ -130,7 +132,7 @@ class ToolRegistry:
             病史记录
         """
         patient_id = args.get("patient_id", "1")
-        return await get_medical_history(patient_id)
+        return get_medical_history(patient_id)
     
     async def _normalize_terms(self, args: Dict[str, Any]) -> List[Dict]:
         """
@@ -143,4 +145,4 @@ class ToolRegistry:
             归一化结果
         """
         terms = args.get("terms", [])
-        return await normalize_medical_terms(terms)
+        return normalize_medical_terms(terms)
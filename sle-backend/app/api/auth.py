@@ -1,73 +1,113 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from datetime import datetime, timedelta, timezone
+import asyncio
 import bcrypt
+import jwt
+import os
+
+from app.api.schemas import LoginRequest, RegisterRequest, ResetPasswordRequest
+from app.config.settings import settings
+
+# bcrypt 计算轮数(默认12轮单次约250ms,会长时间占用同步worker)
+# 已有哈希中记录了各自的轮数,调整后仍可正常校验
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 10))
+
+
+def hash_password(password: str) -> str:
+    """使用 BCRYPT_ROUNDS 轮 bcrypt 加密密码"""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
+
+
+def check_password(password: str, hashed_password: str) -> bool:
+    """校验密码与 bcrypt 哈希是否匹配"""
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+def create_access_token(identity: str) -> str:
+    """签发访问令牌"""
+    now = datetime.now(timezone.utc)
+    payload = {
+        'sub': identity,
+        'type': 'access',
+        'iat': now,
+        'exp': now + timedelta(minutes=settings.JWT_ACCESS_TOKEN_EXPIRES_MINUTES)
+    }
+    return jwt.encode(payload, settings.JWT_SECRET_KEY, algorithm='HS256')
+
 
 # 模拟用户数据
 users = {
     'admin': {
-        'password': bcrypt.hashpw('password123'.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        'password': hash_password('password123')
     }
 }
 
-bp = Blueprint('auth', __name__, url_prefix='/api/auth')
+router = APIRouter(prefix='/api/auth')
+
+
+def error_response(message: str, status_code: int) -> JSONResponse:
+    """与原接口一致的错误响应格式"""
+    return JSONResponse({'error': message}, status_code=status_code)
 
-@bp.route('/login', methods=['POST'])
-def login():
-    data = request.get_json()
-    username = data.get('username')
-    password = data.get('password')
+
+@router.post('/login')
+async def login(request: LoginRequest):
+    username = request.username
+    password = request.password
 
     if not username or not password:
-        return jsonify({'error': '请输入用户名和密码'}), 400
+        return error_response('请输入用户名和密码', 400)
 
     if username not in users:
-        return jsonify({'error': '用户名或密码错误'}), 401
+        return error_response('用户名或密码错误', 401)
 
-    if not bcrypt.checkpw(password.encode('utf-8'), users[username]['password'].encode('utf-8')):
-        return jsonify({'error': '用户名或密码错误'}), 401
+    # bcrypt 计算放到线程中,不阻塞事件循环
+    if not await asyncio.to_thread(check_password, password, users[username]['password']):
+        return error_response('用户名或密码错误', 401)
 
     # 创建访问令牌
     access_token = create_access_token(identity=username)
-    return jsonify({'access_token': access_token, 'message': '登录成功'}), 200
+    return {'access_token': access_token, 'message': '登录成功'}
+
 
-@bp.route('/register', methods=['POST'])
-def register():
-    data = request.get_json()
-    username = data.get('username')
-    password = data.get('password')
+@router.post('/register', status_code=201)
+async def register(request: RegisterRequest):
+    username = request.username
+    password = request.password
 
     if not username or not password:
-        return jsonify({'error': '请输入用户名和密码'}), 400
+        return error_response('请输入用户名和密码', 400)
 
     if username in users:
-        return jsonify({'error': '用户名已存在'}), 400
+        return error_response('用户名已存在', 400)
 
     if len(password) < 6:
-        return jsonify({'error': '密码长度至少为6位'}), 400
+        return error_response('密码长度至少为6位', 400)
 
     # 加密密码并添加用户
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    hashed_password = await asyncio.to_thread(hash_password, password)
     users[username] = {'password': hashed_password}
 
-    return jsonify({'message': '注册成功'}), 201
+    return {'message': '注册成功'}
+
 
-@bp.route('/reset-password', methods=['POST'])
-def reset_password():
-    data = request.get_json()
-    username = data.get('username')
-    new_password = data.get('newPassword')
+@router.post('/reset-password')
+async def reset_password(request: ResetPasswordRequest):
+    username = request.username
+    new_password = request.new_password
 
     if not username or not new_password:
-        return jsonify({'error': '请输入用户名和新密码'}), 400
+        return error_response('请输入用户名和新密码', 400)
 
     if username not in users:
-        return jsonify({'error': '用户名不存在'}), 404
+        return error_response('用户名不存在', 404)
 
     if len(new_password) < 6:
-        return jsonify({'error': '新密码长度至少为6位'}), 400
+        return error_response('新密码长度至少为6位', 400)
 
     # 更新密码
-    hashed_password = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    hashed_password = await asyncio.to_thread(hash_password, new_password)
     users[username]['password'] = hashed_password
 
-    return jsonify({'message': '密码修改成功'}), 200
+    return {'message': '密码修改成功'}
@@ -1,5 +1,10 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required
+from fastapi import APIRouter, Body, Request
+from fastapi.responses import JSONResponse
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+import numpy as np
+import sys
+from app.api.responses import cached_body, etag_response, json_array_response
 
 # 模拟患者数据
 dummy_patient_data = {
@@ -72,46 +77,16 @@ dummy_patient_data = {
     }
 }
 
-bp = Blueprint('patient', __name__, url_prefix='/api/patient')
-
-@bp.route('/<patient_id>', methods=['GET'])
-def get_patient_data(patient_id):
-    if patient_id not in dummy_patient_data:
-        return jsonify({'error': '患者不存在'}), 404
-
-    return jsonify(dummy_patient_data[patient_id]), 200
-
-@bp.route('/<patient_id>/history', methods=['GET'])
-def get_patient_history(patient_id):
-    if patient_id not in dummy_patient_data:
-        return jsonify({'error': '患者不存在'}), 404
-
-    test_type = request.args.get('type', 'blood')
-    history = dummy_patient_data[patient_id]['history']
-    filtered_history = [h for h in history if h['type'] == test_type]
-
-    return jsonify(filtered_history), 200
-
-@bp.route('/<patient_id>/upload', methods=['POST'])
-def upload_patient_data(patient_id):
-    # 模拟上传功能
-    data = request.get_json()
-    print('上传数据:', data)
-
-    return jsonify({'message': '上传成功'}), 201
+# 血常规指标参考范围(下限, 上限),超出范围即视为异常
+BLOOD_REFERENCE_RANGES = {
+    '白细胞计数': (4.0, 10.0),
+    '红细胞计数': (3.5, 5.5),
+    '血小板计数': (100, 300)
+}
 
-@bp.route('/<patient_id>/abnormal', methods=['GET'])
-def get_abnormal_indices(patient_id):
-    # 模拟异常指标检测
-    abnormal_indices = [
-        {
-            'test_id': 3,
-            'date': '2026-01-15',
-            'index': '白细胞计数',
-            'value': 3.8,
-            'reference_range': '4.0-10.0',
-            'status': '异常'
-        },
+# 历史记录中未包含的检查项(尿常规、抗体)的模拟异常结果
+dummy_abnormal_indices = {
+    '1': [
         {
             'test_id': 3,
             'date': '2026-01-15',
@@ -129,5 +104,182 @@ def get_abnormal_indices(patient_id):
             'status': '异常'
         }
     ]
+}
+
+
+def _intern_keys(record: Dict[str, Any]) -> Dict[str, Any]:
+    """驻留字典(含嵌套字典)的键,使上传的记录与已有记录共用同一批键对象"""
+    return {
+        sys.intern(key): _intern_keys(value) if isinstance(value, dict) else value
+        for key, value in record.items()
+    }
+
+
+# 中文指标名等非标识符字符串不会被自动驻留,统一驻留后新上传的记录可以复用这些键
+for _patient in dummy_patient_data.values():
+    _patient['history'] = [_intern_keys(h) for h in _patient['history']]
+
+def _build_blood_columns(history: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    将血常规历史记录转换为按列存储的数组,便于向量化计算
+
+    Args:
+        history: 患者历史记录列表
+
+    Returns:
+        {列名: 数组},包含 test_id、date 和各项血常规指标,缺失值为 NaN
+    """
+    blood = [h for h in history if h['type'] == 'blood']
+    columns = {
+        'test_id': np.array([h['test_id'] for h in blood], dtype=np.int32),
+        'date': np.array([h['date'] for h in blood], dtype='datetime64[D]')
+    }
+    for index_name in BLOOD_REFERENCE_RANGES:
+        columns[index_name] = np.array([h['data'].get(index_name, np.nan) for h in blood], dtype=np.float64)
+    return columns
+
+
+def _detect_abnormal_indices(patient_id: str,
+                             columns: Optional[Dict[str, np.ndarray]] = None) -> List[Dict[str, Any]]:
+    """
+    检测患者的异常指标: 血常规按参考范围逐列比较,其余检查项使用模拟结果
+
+    Args:
+        patient_id: 患者ID
+        columns: 血常规列数据,默认使用 _BLOOD_COLUMNS 中该患者的数据
+
+    Returns:
+        异常指标列表,按检查记录顺序排列
+    """
+    if columns is None:
+        columns = _BLOOD_COLUMNS[patient_id]
+    hits = []
+    for order, (index_name, (low, high)) in enumerate(BLOOD_REFERENCE_RANGES.items()):
+        values = columns[index_name]
+        for row in np.flatnonzero((values < low) | (values > high)):
+            hits.append((row, order, index_name, f'{low}-{high}'))
+    hits.sort()
+
+    abnormal_indices = [
+        {
+            'test_id': int(columns['test_id'][row]),
+            'date': str(columns['date'][row]),
+            'index': index_name,
+            'value': float(columns[index_name][row]),
+            'reference_range': reference_range,
+            'status': '异常'
+        }
+        for row, _, index_name, reference_range in hits
+    ]
+    return abnormal_indices + dummy_abnormal_indices.get(patient_id, [])
+
+
+# 血常规按列存储: {患者ID: {列名: 数组}}
+_BLOOD_COLUMNS = {pid: _build_blood_columns(patient['history']) for pid, patient in dummy_patient_data.items()}
+
+# 导入时预先序列化并计算ETag,请求时直接返回字节;患者数据和异常指标在上传新记录时重新生成
+_PATIENT_BODIES = {pid: cached_body(patient) for pid, patient in dummy_patient_data.items()}
+_ABNORMAL_BODIES = {pid: cached_body(_detect_abnormal_indices(pid)) for pid in dummy_patient_data}
+
+# 按检查类型分桶的历史记录索引: {患者ID: {检查类型: [记录, ...]}}
+_HISTORY_INDEX = {pid: defaultdict(list) for pid in dummy_patient_data}
+for _pid, _patient in dummy_patient_data.items():
+    for _entry in _patient['history']:
+        _HISTORY_INDEX[_pid][_entry['type']].append(_entry)
+
+
+def _validate_history_entry(data: Any) -> Optional[str]:
+    """
+    检查上传的历史记录是否包含必需字段
+
+    Args:
+        data: 请求体
+
+    Returns:
+        错误信息,记录有效时返回None
+    """
+    if not isinstance(data, dict):
+        return '请求体必须是JSON对象'
+    missing = [field for field in ('type', 'test_id', 'date', 'data') if field not in data]
+    if missing:
+        return f'缺少字段: {", ".join(missing)}'
+    if not isinstance(data['type'], str):
+        return 'type 必须是字符串'
+    if not isinstance(data['data'], dict):
+        return 'data 必须是JSON对象'
+    return None
+
+
+def _add_history_entry(patient_id: str, entry: Dict[str, Any]):
+    """
+    追加一条历史记录,同步更新类型索引和预序列化的患者数据
+
+    先在局部变量中生成列数据和响应体,全部成功后才写入共享数据,
+    无效记录不会留在历史记录中
+
+    Raises:
+        ValueError: 血常规记录的编号、日期或指标值无法转换
+    """
+    entry = _intern_keys(entry)
+    patient = dummy_patient_data[patient_id]
+    history = patient['history'] + [entry]
+    patient_body = cached_body({**patient, 'history': history})
+    if entry['type'] == 'blood':
+        try:
+            blood_columns = _build_blood_columns(history)
+        except (TypeError, ValueError, OverflowError) as e:
+            raise ValueError(f'血常规记录无效: {e}') from e
+        abnormal_body = cached_body(_detect_abnormal_indices(patient_id, blood_columns))
+
+    patient['history'].append(entry)
+    _HISTORY_INDEX[patient_id][entry['type']].append(entry)
+    _PATIENT_BODIES[patient_id] = patient_body
+    if entry['type'] == 'blood':
+        _BLOOD_COLUMNS[patient_id] = blood_columns
+        _ABNORMAL_BODIES[patient_id] = abnormal_body
+
+
+router = APIRouter(prefix='/api/patient')
+
+
+@router.get('/{patient_id}')
+async def get_patient_data(patient_id: str, request: Request):
+    if patient_id not in dummy_patient_data:
+        return JSONResponse({'error': '患者不存在'}, status_code=404)
+
+    return etag_response(request, _PATIENT_BODIES[patient_id])
+
+
+@router.get('/{patient_id}/history')
+async def get_patient_history(patient_id: str, type: str = 'blood'):
+    if patient_id not in dummy_patient_data:
+        return JSONResponse({'error': '患者不存在'}, status_code=404)
+
+    filtered_history = _HISTORY_INDEX[patient_id].get(type, [])
+
+    # 历史记录可能很长,逐条序列化并流式返回
+    return json_array_response(filtered_history)
+
+
+@router.post('/{patient_id}/upload', status_code=201)
+async def upload_patient_data(patient_id: str, data: Dict[str, Any] = Body(None)):
+    # 模拟上传功能
+    print('上传数据:', data)
+    error = _validate_history_entry(data)
+    if error:
+        return JSONResponse({'error': error}, status_code=400)
+    if patient_id in dummy_patient_data:
+        try:
+            _add_history_entry(patient_id, data)
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=400)
+
+    return {'message': '上传成功'}
+
+
+@router.get('/{patient_id}/abnormal')
+async def get_abnormal_indices(patient_id: str, request: Request):
+    if patient_id not in dummy_patient_data:
+        return JSONResponse({'error': '患者不存在'}, status_code=404)
 
-    return jsonify(abnormal_indices), 200
+    return etag_response(request, _ABNORMAL_BODIES[patient_id])
@@ -0,0 +1,101 @@
+"""
+API响应类
+"""
+
+from typing import Any, AsyncIterator, Iterable, NamedTuple
+import hashlib
+
+import orjson
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """使用 orjson 序列化的JSON响应,无法直接序列化的类型转为字符串"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            default=str,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+
+
+async def iter_json_array(items: Iterable[Any]) -> AsyncIterator[bytes]:
+    """
+    逐项序列化列表,以JSON数组的形式分块输出
+
+    Args:
+        items: 待序列化的元素,可以是列表或数据库游标等可迭代对象
+
+    Yields:
+        JSON数组的各个片段
+    """
+    yield b'['
+    separator = b''
+    for item in items:
+        yield separator + orjson.dumps(item, default=str)
+        separator = b','
+    yield b']'
+
+
+def json_array_response(items: Iterable[Any]) -> StreamingResponse:
+    """
+    流式返回JSON数组,无需先在内存中拼出完整响应
+
+    Args:
+        items: 数组元素
+
+    Returns:
+        流式JSON响应
+    """
+    return StreamingResponse(iter_json_array(items), media_type="application/json")
+
+
+class CachedBody(NamedTuple):
+    """预先序列化的响应体及其强ETag"""
+    body: bytes
+    etag: str
+
+
+def cached_body(content: Any) -> CachedBody:
+    """
+    序列化内容并计算ETag
+
+    Args:
+        content: 待序列化的内容
+
+    Returns:
+        响应体和ETag
+    """
+    body = orjson.dumps(content)
+    return CachedBody(body, '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"')
+
+
+def _opaque_tag(tag: str) -> str:
+    """去掉弱ETag的 W/ 前缀,用于弱比较(RFC 9110 13.1.2)"""
+    tag = tag.strip()
+    return tag[2:] if tag.startswith('W/') else tag
+
+
+def etag_response(request: Request, cached: CachedBody, max_age: int = 30) -> Response:
+    """
+    返回预先序列化的响应,客户端缓存的ETag仍然有效时返回304且不带响应体
+
+    If-None-Match 按弱比较匹配,经GZip或代理转为 W/ 前缀的ETag同样有效
+
+    Args:
+        request: 当前请求
+        cached: 预先序列化的响应体及ETag
+        max_age: 客户端可直接使用缓存的秒数
+
+    Returns:
+        200或304响应
+    """
+    headers = {'ETag': cached.etag, 'Cache-Control': f'private, max-age={max_age}'}
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match and (if_none_match.strip() == '*'
+                          or cached.etag in (_opaque_tag(tag) for tag in if_none_match.split(','))):
+        return Response(status_code=304, headers=headers)
+    return Response(cached.body, media_type='application/json', headers=headers)
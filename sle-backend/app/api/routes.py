@@ -1,59 +1,104 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi import APIRouter, HTTPException, UploadFile, File, Request, Response
+from fastapi.exceptions import RequestValidationError
+import logging
+import msgspec
+from pydantic import TypeAdapter, ValidationError
+from typing import List
 from app.api.schemas import (
     HealthCheckResponse,
     NormalizeRequest,
     NormalizeResponse,
+    NormalizedTermDict,
     ParseReportRequest,
     ParseReportResponse,
+    ParseReportStruct,
     MedicalHistoryResponse
 )
+from app.config.settings import settings
+from app.services.cache_service import get_cached, set_cached
 from app.services.normalization_service import normalize_medical_terms
 from app.services.report_parser import parse_report
 from app.services.history_service import get_medical_history
 
+logger = logging.getLogger(__name__)
+
 # 创建路由实例
 router = APIRouter()
 
 
-@router.get("/health", response_model=HealthCheckResponse)
-async def health_check():
+# 以下接口直接返回序列化好的响应,response_model 仅通过 responses 保留在接口文档中
+HEALTHY_BODY = HealthCheckResponse(status="healthy").model_dump_json().encode()
+
+
+@router.get("/health", responses={200: {"model": HealthCheckResponse}})
+async def health_check() -> Response:
     """健康检查接口"""
-    return HealthCheckResponse(status="healthy")
+    return Response(HEALTHY_BODY, media_type="application/json")
+
+
+# 归一化服务返回的是可信的字典列表,直接按模式由 Rust 序列化,省去逐项构建 NormalizedTerm
+NORMALIZED_TERMS_ADAPTER = TypeAdapter(List[NormalizedTermDict])
 
 
-@router.post("/normalize", response_model=NormalizeResponse)
-async def normalize_terms(request: NormalizeRequest):
+@router.post(
+    "/normalize",
+    responses={200: {"model": NormalizeResponse}},
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": NormalizeRequest.model_json_schema()}}
+        }
+    }
+)
+async def normalize_terms(raw_request: Request) -> Response:
     """表单名称归一化接口"""
+    # 由 Pydantic 直接从请求体字节解析并校验,省去先解码为dict再构建模型的一步
+    try:
+        request = NormalizeRequest.model_validate_json(await raw_request.body())
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+        )
+
     try:
-        normalized_terms = await normalize_medical_terms(request.terms)
-        return NormalizeResponse(normalized_terms=normalized_terms)
+        normalized_terms = normalize_medical_terms(request.terms)
+        body = b'{"normalized_terms":' + NORMALIZED_TERMS_ADAPTER.dump_json(normalized_terms) + b'}'
+        return Response(body, media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/parse-report", response_model=ParseReportResponse)
+@router.post("/parse-report", responses={200: {"model": ParseReportResponse}})
 async def parse_medical_report(
     file: UploadFile = File(...),
     report_type: str = "lab"
-):
+) -> Response:
     """检查单解析接口"""
     try:
-        print(f"Received file: {file.filename}, type: {report_type}")
+        logger.debug("Received file: %s, type: %s", file.filename, report_type)
         result = await parse_report(file, report_type)
-        print(f"Parse result: {result}")
-        return ParseReportResponse(**result)
+        logger.debug("Parsed %d indicators", len(result.get('indicators', [])))
+        # 由 msgspec 完成字段校验和编码,不再构建 Pydantic 模型
+        report = msgspec.convert(result, ParseReportStruct)
+        return Response(msgspec.json.encode(report), media_type="application/json")
     except Exception as e:
-        print(f"Error parsing report: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error parsing report: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/medical-history/{patient_id}", response_model=MedicalHistoryResponse)
-async def get_patient_history(patient_id: str):
+@router.get("/medical-history/{patient_id}", responses={200: {"model": MedicalHistoryResponse}})
+async def get_patient_history(patient_id: str) -> Response:
     """获取患者病史接口"""
+    cache_key = f"mh:{patient_id}"
+    cached = await get_cached(cache_key)
+    if cached:
+        return Response(cached, media_type="application/json")
+
     try:
-        history = await get_medical_history(patient_id)
-        return MedicalHistoryResponse(**history)
+        history = get_medical_history(patient_id)
+        body = MedicalHistoryResponse(**history).model_dump_json(exclude_none=True).encode()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+    await set_cached(cache_key, body, settings.MEDICAL_HISTORY_CACHE_TTL)
+    return Response(body, media_type="application/json")
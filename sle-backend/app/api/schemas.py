@@ -1,30 +1,44 @@
-from pydantic import BaseModel, Field
+import msgspec
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Dict, Optional, Any
+from typing_extensions import TypedDict
 
 
-class HealthCheckResponse(BaseModel):
+class FrozenModel(BaseModel):
+    """接口模型基类: 构建后不可修改,忽略未声明的字段"""
+    model_config = ConfigDict(frozen=True, extra='ignore')
+
+
+class HealthCheckResponse(FrozenModel):
     """健康检查响应模型"""
     status: str
 
 
-class NormalizeRequest(BaseModel):
+class NormalizeRequest(FrozenModel):
     """表单名称归一化请求模型"""
     terms: List[str] = Field(..., description="需要归一化的医学术语列表")
 
 
-class NormalizedTerm(BaseModel):
+class NormalizedTerm(FrozenModel):
     """归一化术语模型"""
     original: str = Field(..., description="原始术语")
     normalized: str = Field(..., description="归一化后的术语")
     confidence: float = Field(..., description="归一化的置信度")
 
 
-class NormalizeResponse(BaseModel):
+class NormalizedTermDict(TypedDict):
+    """归一化服务返回的术语字典,字段与 NormalizedTerm 一致,用于不构建模型直接序列化"""
+    original: str
+    normalized: str
+    confidence: float
+
+
+class NormalizeResponse(FrozenModel):
     """表单名称归一化响应模型"""
     normalized_terms: List[NormalizedTerm]
 
 
-class Indicator(BaseModel):
+class Indicator(FrozenModel):
     """检查指标模型"""
     name: str = Field(..., description="指标名称")
     value: str = Field(..., description="检测值")
@@ -35,12 +49,12 @@ class Indicator(BaseModel):
     normalization_confidence: Optional[float] = Field(None, description="归一化的置信度")
 
 
-class ParseReportRequest(BaseModel):
+class ParseReportRequest(FrozenModel):
     """检查单解析请求模型"""
     report_type: str = Field(..., description="报告类型 (pathology/lab)")
 
 
-class ParseReportResponse(BaseModel):
+class ParseReportResponse(FrozenModel):
     """检查单解析响应模型"""
     patient_id: Optional[str] = Field(None, description="患者ID")
     report_date: Optional[str] = Field(None, description="检查日期")
@@ -49,7 +63,7 @@ class ParseReportResponse(BaseModel):
     normalization_results: Optional[List[NormalizedTerm]] = Field(None, description="归一化结果列表")
 
 
-class MedicalHistoryItem(BaseModel):
+class MedicalHistoryItem(FrozenModel):
     """病史记录项模型"""
     date: str = Field(..., description="日期")
     diagnosis: Optional[str] = Field(None, description="诊断")
@@ -58,7 +72,54 @@ class MedicalHistoryItem(BaseModel):
     medications: Optional[List[str]] = Field(None, description="用药列表")
 
 
-class MedicalHistoryResponse(BaseModel):
+class MedicalHistoryResponse(FrozenModel):
     """患者病史响应模型"""
     patient_id: str = Field(..., description="患者ID")
     medical_history: List[MedicalHistoryItem] = Field(..., description="病史记录列表")
+
+
+class LoginRequest(FrozenModel):
+    """登录请求模型"""
+    username: Optional[str] = Field(None, description="用户名")
+    password: Optional[str] = Field(None, description="密码")
+
+
+class RegisterRequest(FrozenModel):
+    """注册请求模型"""
+    username: Optional[str] = Field(None, description="用户名")
+    password: Optional[str] = Field(None, description="密码")
+
+
+class ResetPasswordRequest(FrozenModel):
+    """修改密码请求模型"""
+    username: Optional[str] = Field(None, description="用户名")
+    new_password: Optional[str] = Field(None, alias="newPassword", description="新密码")
+
+
+# 以下 msgspec 结构体与同名 Pydantic 模型字段一致,仅用于热点接口的内部转换和序列化
+# Pydantic 模型继续用于接口文档;omit_defaults 使值为None的可选字段不输出
+class NormalizedTermStruct(msgspec.Struct, frozen=True, omit_defaults=True):
+    """归一化术语结构体"""
+    original: str
+    normalized: str
+    confidence: float
+
+
+class IndicatorStruct(msgspec.Struct, frozen=True, omit_defaults=True):
+    """检查指标结构体"""
+    name: str
+    value: str
+    unit: Optional[str] = None
+    reference_range: Optional[str] = None
+    is_abnormal: Optional[bool] = None
+    normalized_name: Optional[str] = None
+    normalization_confidence: Optional[float] = None
+
+
+class ParseReportStruct(msgspec.Struct, frozen=True, omit_defaults=True, kw_only=True):
+    """检查单解析结果结构体"""
+    patient_id: Optional[str] = None
+    report_date: Optional[str] = None
+    report_type: str
+    indicators: List[IndicatorStruct]
+    normalization_results: Optional[List[NormalizedTermStruct]] = None
@@ -4,10 +4,227 @@ AI语义分类服务
 支持阿里云百炼和智谱GLM两种AI服务
 """
 
-from typing import Dict, List, Optional
+from functools import cached_property
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import copy
+import email.utils
+import hashlib
 import httpx
+import importlib.util
 import json
+import orjson
+import random
+import time
+import unicodedata
 from app.config.settings import settings
+from app.services.term_cache import ResponseCache, TermCache
+
+
+# 安装了 h2 时使用HTTP/2,并发请求可复用同一连接
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# 超过此长度(字符)的提示词在线程池中拼接、编码和计算哈希,避免长报告文本阻塞事件循环
+LARGE_PROMPT_CHARS = 64 * 1024
+
+# 限流和服务端临时错误,退避后重试
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# 429响应的 Retry-After 等待时间上限(秒),避免单个请求被挂起过久
+MAX_RETRY_AFTER = 30.0
+
+
+class CircuitOpenError(RuntimeError):
+    """AI接口连续失败,熔断冷却期内不再发起请求"""
+
+
+# 批量分类提示词模板(花括号已转义,使用 str.format 填充)
+BATCH_PROMPT_TEMPLATE = """你是一个专业的医学术语分类助手。请将给定的医学术语分类到最接近的标准术语中。
+
+标准术语列表：
+{standard_terms_list}
+
+需要分类的术语：
+{terms_list}
+
+请分析每个术语的语义，并返回JSON格式的分类结果，格式如下：
+{{
+  "results": [
+    {{
+      "original": "原始术语",
+      "normalized": "最匹配的标准术语名称",
+      "category": "该术语所属的医学类别",
+      "confidence": 匹配置信度（0-1之间的浮点数）,
+      "explanation": "简要说明分类理由"
+    }}
+  ]
+}}
+
+如果术语与任何标准术语都不相关，请将normalized设为原术语，category设为"其他"，confidence设为0.3。
+
+只返回JSON，不要包含其他内容。"""
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """
+    解析 Retry-After 响应头,支持秒数和HTTP日期两种格式
+
+    Args:
+        response: HTTP响应
+
+    Returns:
+        需要等待的秒数(不超过 MAX_RETRY_AFTER),没有或无法解析时返回None
+    """
+    value = response.headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(delay, 0.0), MAX_RETRY_AFTER)
+
+
+def extract_json(content: str) -> str:
+    """
+    从AI返回的内容中截取第一个完整的JSON对象,忽略模型常附带的 ```json 代码块标记和说明文字
+    
+    单次扫描,按花括号深度匹配,字符串内的括号和转义字符不计入
+    
+    Args:
+        content: AI返回的文本
+        
+    Returns:
+        JSON对象文本,找不到完整对象时原样返回
+    """
+    start = content.find("{")
+    if start < 0:
+        return content
+    depth = 0
+    in_string = False
+    escaped = False
+    for index in range(start, len(content)):
+        char = content[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return content[start:index + 1]
+    return content
+
+
+def canonical_term(term: str) -> str:
+    """
+    规范化术语: 全角转半角(NFKC)、合并空白、英文转小写,使写法不同的同一术语只分类一次
+    
+    Args:
+        term: 原始术语
+        
+    Returns:
+        规范化后的术语
+    """
+    return " ".join(unicodedata.normalize("NFKC", term).split()).lower()
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的token数: 按每个字符一个token计,中文约1-1.5字符/token、英文约4字符/token,取保守值
+    
+    Args:
+        text: 文本
+        
+    Returns:
+        估算的token数
+    """
+    return len(text)
+
+
+def chunk_batch_terms(terms: List[str], max_tokens: int) -> List[List[int]]:
+    """
+    按估算token数把术语拆分为多组,规范化后写法相同的术语分在同一组,只在一次请求中分类
+    
+    Args:
+        terms: 术语列表
+        max_tokens: 每组术语的估算token上限
+        
+    Returns:
+        每组术语在 terms 中的下标列表
+    """
+    groups: Dict[str, List[int]] = {}
+    for index, term in enumerate(terms):
+        groups.setdefault(canonical_term(term), []).append(index)
+    
+    chunks = []
+    current: List[int] = []
+    cost = 0
+    for key, indices in groups.items():
+        # 提示词中每个术语还带有 "序号. " 前缀和换行
+        term_cost = estimate_tokens(key) + 4
+        if current and cost + term_cost > max_tokens:
+            chunks.append(current)
+            current, cost = [], 0
+        current.extend(indices)
+        cost += term_cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def expand_batch_results(terms: List[str], unique_terms: List[str], results: List[Dict]) -> List[Dict]:
+    """
+    将去重后术语的分类结果按原始顺序展开到每个输入术语
+    
+    按AI回显的 original 字段匹配结果,模型漏掉或打乱某一项时不会错配到其他术语;
+    只有全部结果都没有 original 且数量与 unique_terms 一致时才按位置对应,
+    这类结果无法核对,展开后不带 original 字段
+    
+    Args:
+        terms: 原始术语列表
+        unique_terms: 去重并规范化后发送给AI的术语列表
+        results: AI返回的分类结果
+        
+    Returns:
+        与 terms 一一对应的分类结果列表
+    """
+    results = [result for result in results if isinstance(result, dict)]
+    by_term: Dict[str, Dict] = {}
+    for result in results:
+        original = result.get("original")
+        if isinstance(original, str):
+            by_term.setdefault(canonical_term(original), result)
+    positional = not by_term and len(results) == len(unique_terms)
+    if positional:
+        by_term = dict(zip(unique_terms, results))
+    
+    expanded = []
+    for term in terms:
+        result = by_term.get(canonical_term(term))
+        if result is None:
+            expanded.append({
+                "original": term,
+                "normalized": term,
+                "category": "其他",
+                "confidence": 0.0,
+                "explanation": "AI未返回该术语的分类结果"
+            })
+        elif positional:
+            expanded.append({key: value for key, value in result.items() if key != "original"})
+        else:
+            expanded.append({**result, "original": term})
+    return expanded
 
 
 class AISemanticClassifier:
@@ -34,6 +251,29 @@ class AISemanticClassifier:
             "IgA": "免疫功能",
             "IgM": "免疫功能"
         }
+        # 标准术语列表在各提示词中共用,只生成一次
+        self._standard_terms_list = "\n".join(
+            f"- {name} ({category})" for name, category in self.standard_terms.items()
+        )
+        # 输入本身就是标准术语时直接给出结果,按规范化写法匹配
+        self._standard_results = {
+            canonical_term(name): {
+                "normalized": name,
+                "category": category,
+                "confidence": 1.0,
+                "explanation": "标准术语"
+            }
+            for name, category in self.standard_terms.items()
+        }
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop = None
+        self._fail_count = 0
+        # 熔断打开时为冷却结束的时间,关闭时为0;冷却结束后进入半开状态
+        self._circuit_open_until = 0.0
+        self._probe_in_flight = False
+        self._response_cache = ResponseCache(
+            settings.AI_TERM_CACHE_PATH, settings.AI_RESPONSE_CACHE_SIZE, settings.AI_RESPONSE_CACHE_TTL
+        )
     
     async def classify_term(self, term: str) -> Dict:
         """
@@ -64,35 +304,47 @@ class AISemanticClassifier:
         if not terms:
             return []
         
-        # 构建批量分类提示词
-        standard_terms_list = "\n".join([f"- {name} ({category})" for name, category in self.standard_terms.items()])
+        # 已经是标准术语的直接返回,只把其余术语发送给AI
+        results = [self._standard_results.get(canonical_term(term)) for term in terms]
+        pending = [term for term, result in zip(terms, results) if result is None]
         
-        terms_list = "\n".join([f"{i+1}. {term}" for i, term in enumerate(terms)])
+        # 术语过多时一次提示词可能超出模型上下文,按估算token数拆分后限制并发地请求
+        ai_results: List[Optional[Dict]] = [None] * len(pending)
+        sem = asyncio.Semaphore(settings.AI_BATCH_CONCURRENCY)
         
-        prompt = f"""你是一个专业的医学术语分类助手。请将给定的医学术语分类到最接近的标准术语中。
-
-标准术语列表：
-{standard_terms_list}
-
-需要分类的术语：
-{terms_list}
-
-请分析每个术语的语义，并返回JSON格式的分类结果，格式如下：
-{{
-  "results": [
-    {{
-      "original": "原始术语",
-      "normalized": "最匹配的标准术语名称",
-      "category": "该术语所属的医学类别",
-      "confidence": 匹配置信度（0-1之间的浮点数）,
-      "explanation": "简要说明分类理由"
-    }}
-  ]
-}}
-
-如果术语与任何标准术语都不相关，请将normalized设为原术语，category设为"其他"，confidence设为0.3。
-
-只返回JSON，不要包含其他内容。"""
+        async def one(chunk: List[int]):
+            async with sem:
+                chunk_results = await self._classify_batch_with_ai([pending[i] for i in chunk])
+            for i, result in zip(chunk, chunk_results):
+                ai_results[i] = result
+        
+        await asyncio.gather(*(one(chunk) for chunk in chunk_batch_terms(pending, settings.AI_BATCH_MAX_TOKENS)))
+        
+        ai_iter = iter(ai_results)
+        return [
+            {**result, "original": term} if result is not None else next(ai_iter)
+            for term, result in zip(terms, results)
+        ]
+    
+    async def _classify_batch_with_ai(self, terms: List[str]) -> List[Dict]:
+        """
+        调用AI批量分类术语
+        
+        Args:
+            terms: 需要分类的术语列表
+            
+        Returns:
+            分类结果列表,与 terms 一一对应
+        """
+        # 构建批量分类提示词
+        # 重复或仅写法不同的术语只发送一次
+        unique_terms = list(dict.fromkeys(canonical_term(term) for term in terms))
+        terms_list = "\n".join([f"{i+1}. {term}" for i, term in enumerate(unique_terms)])
+        
+        prompt = BATCH_PROMPT_TEMPLATE.format(
+            standard_terms_list=self._standard_terms_list,
+            terms_list=terms_list
+        )
         
         if not self.api_key:
             return [
@@ -106,49 +358,35 @@ class AISemanticClassifier:
             ]
         
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "messages": [
-                            {"role": "user", "content": prompt}
-                        ],
-                        "temperature": 0.3
-                    }
-                )
+            response = await self._post_chat(prompt, timeout=60.0)
+            
+            if response.status_code == 200:
+                result = orjson.loads(response.content)
+                content = result["choices"][0]["message"]["content"]
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    content = result["choices"][0]["message"]["content"]
-                    
-                    try:
-                        parsed_result = json.loads(content)
-                        return parsed_result.get("results", [])
-                    except json.JSONDecodeError:
-                        return [
-                            {
-                                "normalized": term,
-                                "category": "其他",
-                                "confidence": 0.4,
-                                "explanation": "AI返回结果解析失败"
-                            }
-                            for term in terms
-                        ]
-                else:
+                try:
+                    parsed_result = orjson.loads(extract_json(content))
+                    return expand_batch_results(terms, unique_terms, parsed_result.get("results", []))
+                except json.JSONDecodeError:
                     return [
                         {
                             "normalized": term,
                             "category": "其他",
-                            "confidence": 0.0,
-                            "explanation": f"API调用失败: {response.status_code}"
+                            "confidence": 0.4,
+                            "explanation": "AI返回结果解析失败"
                         }
                         for term in terms
                     ]
+            else:
+                return [
+                    {
+                        "normalized": term,
+                        "category": "其他",
+                        "confidence": 0.0,
+                        "explanation": f"API调用失败: {response.status_code}"
+                    }
+                    for term in terms
+                ]
         except Exception as e:
             return [
                 {
@@ -183,12 +421,10 @@ class AISemanticClassifier:
         Returns:
             提示词
         """
-        standard_terms_list = "\n".join([f"- {name} ({category})" for name, category in self.standard_terms.items()])
-        
         prompt = f"""你是一个专业的医学术语分类助手。请将给定的医学术语分类到最接近的标准术语中。
 
 标准术语列表：
-{standard_terms_list}
+{self._standard_terms_list}
 
 请分析术语 "{term}" 的语义，并返回JSON格式的分类结果，包含以下字段：
 - normalized: 最匹配的标准术语名称
@@ -213,8 +449,6 @@ class AISemanticClassifier:
         Returns:
             提示词
         """
-        standard_terms_list = "\n".join([f"- {name} ({category})" for name, category in self.standard_terms.items()])
-        
         prompt = f"""你是一个专业的医学检查单解析助手。请从以下检查单文本中提取所有检查指标及其对应值。
 
 检查单类型：{report_type}
@@ -254,6 +488,136 @@ class AISemanticClassifier:
         return prompt
 
 
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        获取复用的HTTP客户端,保持连接池避免每次调用都重新建立TCP/TLS连接
+        
+        客户端与创建时的事件循环绑定,在新的事件循环中(如脚本多次 asyncio.run)会重新创建
+        
+        Returns:
+            HTTP客户端
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=HTTP2_AVAILABLE,
+                timeout=httpx.Timeout(60.0, connect=5.0),
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                }
+            )
+            self._client_loop = loop
+        return self._client
+    
+    async def _post_chat(self, prompt: str, timeout: float) -> httpx.Response:
+        """
+        调用对话补全接口
+        
+        请求体完全相同时直接返回缓存的成功响应;
+        限流(429)、5xx和网络错误按指数退避重试,429带 Retry-After 时按其等待;
+        连续失败达到阈值后熔断,冷却期内直接抛出 CircuitOpenError,由调用方返回默认结果;
+        冷却结束后半开,只放行一个不重试的探测请求,成功才关闭熔断,失败则重新冷却
+        
+        Args:
+            prompt: 提示词
+            timeout: 本次请求的超时时间(秒)
+            
+        Returns:
+            HTTP响应
+        """
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.3
+        }
+        if len(prompt) > LARGE_PROMPT_CHARS:
+            body, cache_key = await asyncio.to_thread(self._encode_payload, payload)
+        else:
+            body, cache_key = self._encode_payload(payload)
+        cached = self._response_cache.get(cache_key)
+        if cached is not None:
+            return httpx.Response(200, content=cached)
+        
+        probe = False
+        if self._circuit_open_until:
+            if time.monotonic() < self._circuit_open_until or self._probe_in_flight:
+                raise CircuitOpenError("AI服务连续调用失败,暂停请求")
+            self._probe_in_flight = probe = True
+        
+        # 直接发送orjson序列化好的字节,Content-Type 已在客户端的默认请求头中设置
+        retries = 0 if probe else settings.AI_MAX_RETRIES
+        try:
+            for attempt in range(retries + 1):
+                delay = None
+                try:
+                    response = await self._get_client().post("/chat/completions", content=body, timeout=timeout)
+                except httpx.TransportError:
+                    if attempt == retries:
+                        self._record_failure()
+                        raise
+                else:
+                    if response.status_code not in RETRY_STATUS_CODES:
+                        self._fail_count = 0
+                        self._circuit_open_until = 0.0
+                        if response.status_code == 200 and self._is_valid_completion(response.content):
+                            self._response_cache.set(cache_key, response.content)
+                        return response
+                    if attempt == retries:
+                        self._record_failure()
+                        return response
+                    if response.status_code == 429:
+                        delay = retry_after_seconds(response)
+                if delay is None:
+                    delay = 2 ** attempt
+                # 加入随机抖动,避免并发请求同时重试
+                await asyncio.sleep(delay + random.random() * 0.1)
+        finally:
+            if probe:
+                self._probe_in_flight = False
+    
+    def _encode_payload(self, payload: Dict) -> Tuple[bytes, str]:
+        """
+        序列化请求体并计算响应缓存的键
+        
+        Args:
+            payload: 请求体
+            
+        Returns:
+            (请求体字节, 缓存键)
+        """
+        body = orjson.dumps(payload)
+        return body, hashlib.sha256(self.base_url.encode() + body).hexdigest()
+    
+    @staticmethod
+    def _is_valid_completion(content: bytes) -> bool:
+        """判断响应中的模型输出是否为可解析的JSON,解析失败的输出不缓存,下次重新请求"""
+        try:
+            message = orjson.loads(content)["choices"][0]["message"]["content"]
+            orjson.loads(extract_json(message))
+        except (orjson.JSONDecodeError, KeyError, IndexError, TypeError):
+            return False
+        return True
+    
+    def _record_failure(self):
+        """记录一次重试后仍失败的调用,连续失败达到阈值或半开探测失败时打开熔断"""
+        self._fail_count += 1
+        if self._circuit_open_until or self._fail_count >= settings.AI_CIRCUIT_FAILURES:
+            self._circuit_open_until = time.monotonic() + settings.AI_CIRCUIT_COOLDOWN
+            self._fail_count = 0
+    
+    async def aclose(self):
+        """关闭复用的HTTP客户端"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._client_loop = None
+
+
 class AliyunClassifier(AISemanticClassifier):
     """阿里云百炼分类器"""
     
@@ -284,48 +648,34 @@ class AliyunClassifier(AISemanticClassifier):
         try:
             prompt = self._build_classification_prompt(term)
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "messages": [
-                            {"role": "user", "content": prompt}
-                        ],
-                        "temperature": 0.3
-                    }
-                )
+            response = await self._post_chat(prompt, timeout=30.0)
+            
+            if response.status_code == 200:
+                result = orjson.loads(response.content)
+                content = result["choices"][0]["message"]["content"]
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    content = result["choices"][0]["message"]["content"]
-                    
-                    try:
-                        parsed_result = json.loads(content)
-                        return {
-                            "normalized": parsed_result.get("normalized", term),
-                            "category": parsed_result.get("category", "其他"),
-                            "confidence": float(parsed_result.get("confidence", 0.5)),
-                            "explanation": parsed_result.get("explanation", "")
-                        }
-                    except json.JSONDecodeError:
-                        return {
-                            "normalized": term,
-                            "category": "其他",
-                            "confidence": 0.4,
-                            "explanation": "AI返回结果解析失败"
-                        }
-                else:
+                try:
+                    parsed_result = orjson.loads(extract_json(content))
+                    return {
+                        "normalized": parsed_result.get("normalized", term),
+                        "category": parsed_result.get("category", "其他"),
+                        "confidence": float(parsed_result.get("confidence", 0.5)),
+                        "explanation": parsed_result.get("explanation", "")
+                    }
+                except json.JSONDecodeError:
                     return {
                         "normalized": term,
                         "category": "其他",
-                        "confidence": 0.0,
-                        "explanation": f"API调用失败: {response.status_code}"
+                        "confidence": 0.4,
+                        "explanation": "AI返回结果解析失败"
                     }
+            else:
+                return {
+                    "normalized": term,
+                    "category": "其他",
+                    "confidence": 0.0,
+                    "explanation": f"API调用失败: {response.status_code}"
+                }
         except Exception as e:
             return {
                 "normalized": term,
@@ -353,47 +703,36 @@ class AliyunClassifier(AISemanticClassifier):
             }
         
         try:
-            prompt = self._build_report_parsing_prompt(text, report_type)
+            if len(text) > LARGE_PROMPT_CHARS:
+                prompt = await asyncio.to_thread(self._build_report_parsing_prompt, text, report_type)
+            else:
+                prompt = self._build_report_parsing_prompt(text, report_type)
             
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "messages": [
-                            {"role": "user", "content": prompt}
-                        ],
-                        "temperature": 0.3
-                    }
-                )
+            response = await self._post_chat(prompt, timeout=60.0)
+            
+            if response.status_code == 200:
+                result = orjson.loads(response.content)
+                content = result["choices"][0]["message"]["content"]
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    content = result["choices"][0]["message"]["content"]
-                    
-                    try:
-                        parsed_result = json.loads(content)
-                        return {
-                            "indicators": parsed_result.get("indicators", []),
-                            "patient_info": parsed_result.get("patient_info", {}),
-                            "report_info": parsed_result.get("report_info", {})
-                        }
-                    except json.JSONDecodeError:
-                        return {
-                            "indicators": [],
-                            "patient_info": {},
-                            "report_info": {}
-                        }
-                else:
+                try:
+                    parsed_result = orjson.loads(extract_json(content))
+                    return {
+                        "indicators": parsed_result.get("indicators", []),
+                        "patient_info": parsed_result.get("patient_info", {}),
+                        "report_info": parsed_result.get("report_info", {})
+                    }
+                except json.JSONDecodeError:
                     return {
                         "indicators": [],
                         "patient_info": {},
                         "report_info": {}
                     }
+            else:
+                return {
+                    "indicators": [],
+                    "patient_info": {},
+                    "report_info": {}
+                }
         except Exception as e:
             return {
                 "indicators": [],
@@ -432,48 +771,34 @@ class ZhipuClassifier(AISemanticClassifier):
         try:
             prompt = self._build_classification_prompt(term)
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "messages": [
-                            {"role": "user", "content": prompt}
-                        ],
-                        "temperature": 0.3
-                    }
-                )
+            response = await self._post_chat(prompt, timeout=30.0)
+            
+            if response.status_code == 200:
+                result = orjson.loads(response.content)
+                content = result["choices"][0]["message"]["content"]
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    content = result["choices"][0]["message"]["content"]
-                    
-                    try:
-                        parsed_result = json.loads(content)
-                        return {
-                            "normalized": parsed_result.get("normalized", term),
-                            "category": parsed_result.get("category", "其他"),
-                            "confidence": float(parsed_result.get("confidence", 0.5)),
-                            "explanation": parsed_result.get("explanation", "")
-                        }
-                    except json.JSONDecodeError:
-                        return {
-                            "normalized": term,
-                            "category": "其他",
-                            "confidence": 0.4,
-                            "explanation": "AI返回结果解析失败"
-                        }
-                else:
+                try:
+                    parsed_result = orjson.loads(extract_json(content))
+                    return {
+                        "normalized": parsed_result.get("normalized", term),
+                        "category": parsed_result.get("category", "其他"),
+                        "confidence": float(parsed_result.get("confidence", 0.5)),
+                        "explanation": parsed_result.get("explanation", "")
+                    }
+                except json.JSONDecodeError:
                     return {
                         "normalized": term,
                         "category": "其他",
-                        "confidence": 0.0,
-                        "explanation": f"API调用失败: {response.status_code}"
+                        "confidence": 0.4,
+                        "explanation": "AI返回结果解析失败"
                     }
+            else:
+                return {
+                    "normalized": term,
+                    "category": "其他",
+                    "confidence": 0.0,
+                    "explanation": f"API调用失败: {response.status_code}"
+                }
         except Exception as e:
             return {
                 "normalized": term,
@@ -482,122 +807,40 @@ class ZhipuClassifier(AISemanticClassifier):
                 "explanation": f"分类失败: {str(e)}"
             }
     
-    async def classify_terms_batch(self, terms: List[str]) -> List[Dict]:
+
+class AISemanticService:
+    """AI语义分类服务"""
+    
+    def __init__(self):
+        self.provider = settings.AI_SERVICE_PROVIDER
+        self.cache = TermCache(settings.AI_TERM_CACHE_PATH, settings.AI_TERM_CACHE_SIZE)
+    
+    @staticmethod
+    def _is_cacheable(result: Dict) -> bool:
         """
-        批量分类术语 - 使用单次API调用
+        判断分类结果是否来自AI的正常返回,未配置密钥、调用失败和解析失败的结果不缓存
         
         Args:
-            terms: 需要分类的术语列表
+            result: 分类结果
             
         Returns:
-            分类结果列表
+            是否可以缓存
         """
-        if not terms:
-            return []
-        
-        # 构建批量分类提示词
-        standard_terms_list = "\n".join([f"- {name} ({category})" for name, category in self.standard_terms.items()])
-        
-        terms_list = "\n".join([f"{i+1}. {term}" for i, term in enumerate(terms)])
-        
-        prompt = f"""你是一个专业的医学术语分类助手。请将给定的医学术语分类到最接近的标准术语中。
-
-标准术语列表：
-{standard_terms_list}
-
-需要分类的术语：
-{terms_list}
-
-请分析每个术语的语义，并返回JSON格式的分类结果，格式如下：
-{{
-  "results": [
-    {{
-      "original": "原始术语",
-      "normalized": "最匹配的标准术语名称",
-      "category": "该术语所属的医学类别",
-      "confidence": 匹配置信度（0-1之间的浮点数）,
-      "explanation": "简要说明分类理由"
-    }}
-  ]
-}}
-
-如果术语与任何标准术语都不相关，请将normalized设为原术语，category设为"其他"，confidence设为0.3。
-
-只返回JSON，不要包含其他内容。"""
-        
-        if not self.api_key:
-            return [
-                {
-                    "normalized": term,
-                    "category": "其他",
-                    "confidence": 0.0,
-                    "explanation": "未配置API密钥"
-                }
-                for term in terms
-            ]
-        
-        try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "messages": [
-                            {"role": "user", "content": prompt}
-                        ],
-                        "temperature": 0.3
-                    }
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    content = result["choices"][0]["message"]["content"]
-                    
-                    try:
-                        parsed_result = json.loads(content)
-                        return parsed_result.get("results", [])
-                    except json.JSONDecodeError:
-                        return [
-                            {
-                                "normalized": term,
-                                "category": "其他",
-                                "confidence": 0.4,
-                                "explanation": "AI返回结果解析失败"
-                            }
-                            for term in terms
-                        ]
-                else:
-                    return [
-                        {
-                            "normalized": term,
-                            "category": "其他",
-                            "confidence": 0.0,
-                            "explanation": f"API调用失败: {response.status_code}"
-                        }
-                        for term in terms
-                    ]
-        except Exception as e:
-            return [
-                {
-                    "normalized": term,
-                    "category": "其他",
-                    "confidence": 0.0,
-                    "explanation": f"分类失败: {str(e)}"
-                }
-                for term in terms
-            ]
-
-
-class AISemanticService:
-    """AI语义分类服务"""
+        return result.get("confidence", 0) > 0 and result.get("explanation") != "AI返回结果解析失败"
     
-    def __init__(self):
-        self.provider = settings.AI_SERVICE_PROVIDER
-        self.classifier = self._get_classifier()
+    def _get_cached(self, term: str) -> Optional[Dict]:
+        """查询术语在当前服务和模型下的缓存结果"""
+        return self.cache.get(self.provider, self.classifier.model, canonical_term(term))
+    
+    def _set_cached(self, term: str, result: Dict):
+        """缓存术语的分类结果"""
+        if self._is_cacheable(result):
+            self.cache.set(self.provider, self.classifier.model, canonical_term(term), result)
+    
+    @cached_property
+    def classifier(self) -> AISemanticClassifier:
+        """分类器在首次使用时创建,导入模块时不实例化"""
+        return self._get_classifier()
     
     def _get_classifier(self) -> AISemanticClassifier:
         """
@@ -627,7 +870,10 @@ class AISemanticService:
         if threshold is None:
             threshold = settings.AI_NORMALIZATION_THRESHOLD
         
-        result = await self.classifier.classify_term(term)
+        result = self._get_cached(term)
+        if result is None:
+            result = await self.classifier.classify_term(term)
+            self._set_cached(term, result)
         
         if result["confidence"] < threshold:
             result["normalized"] = term
@@ -646,7 +892,23 @@ class AISemanticService:
         Returns:
             分类结果列表
         """
-        results = await self.classifier.classify_terms_batch(terms)
+        # 命中缓存的术语不再发送给AI,只批量分类未命中的术语
+        results = [self._get_cached(term) for term in terms]
+        misses = list(dict.fromkeys(term for term, result in zip(terms, results) if result is None))
+        if misses:
+            miss_results = await self.classifier.classify_terms_batch(misses)
+            # 分类器按输入顺序为每个术语返回一条结果
+            by_term = dict(zip(misses, miss_results))
+            for term, result in by_term.items():
+                # 只缓存AI回显的 original 与术语一致的结果,无法核对的结果可能错配到其他术语
+                if canonical_term(result.get("original", "")) == canonical_term(term):
+                    self._set_cached(term, result)
+            results = [
+                result if result is not None else copy.deepcopy(by_term[term])
+                for term, result in zip(terms, results)
+            ]
+        for term, result in zip(terms, results):
+            result.setdefault("original", term)
         
         if threshold is None:
             threshold = settings.AI_NORMALIZATION_THRESHOLD
@@ -658,6 +920,39 @@ class AISemanticService:
         
         return results
     
+    async def classify_terms_parallel(self, terms: List[str], threshold: float = None, k: int = 8) -> List[Dict]:
+        """
+        逐个术语并发分类,最多同时发出k个请求
+        
+        术语过多、单次批量提示词可能超出模型上下文长度时使用
+        
+        Args:
+            terms: 需要分类的术语列表
+            threshold: 置信度阈值
+            k: 最大并发请求数
+            
+        Returns:
+            分类结果列表,与输入顺序一致
+        """
+        sem = asyncio.Semaphore(k)
+        
+        async def one(term: str) -> Dict:
+            async with sem:
+                return await self.classify_term(term, threshold)
+        
+        # 重复的术语只请求一次
+        unique_terms = list(dict.fromkeys(terms))
+        unique_results = await asyncio.gather(*(one(term) for term in unique_terms))
+        by_term = dict(zip(unique_terms, unique_results))
+        
+        results = []
+        seen = set()
+        for term in terms:
+            result = by_term[term]
+            results.append(copy.deepcopy(result) if term in seen else result)
+            seen.add(term)
+        return results
+    
     async def parse_report_text(self, text: str, report_type: str) -> Dict:
         """
         解析检查单文本
@@ -670,6 +965,11 @@ class AISemanticService:
             解析结果字典
         """
         return await self.classifier.parse_report_text(text, report_type)
+    
+    async def aclose(self):
+        """释放分类器持有的HTTP连接"""
+        if "classifier" in self.__dict__:
+            await self.classifier.aclose()
 
 
 # 创建全局服务实例
@@ -0,0 +1,73 @@
+"""
+响应缓存服务
+使用Redis缓存序列化好的响应字节,未配置 REDIS_URL 时不启用
+"""
+
+import logging
+from typing import Optional
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# 异步Redis客户端,False 表示未配置或缺少 redis 库
+_redis_client = None
+
+
+def get_redis():
+    """
+    获取异步Redis客户端(懒加载)
+
+    Returns:
+        Redis客户端,未启用缓存时返回None
+    """
+    global _redis_client
+    if _redis_client is None:
+        if not settings.REDIS_URL:
+            _redis_client = False
+        else:
+            try:
+                import redis.asyncio as aioredis
+                _redis_client = aioredis.from_url(settings.REDIS_URL)
+            except ImportError:
+                print("警告: 需要安装 redis 库来启用响应缓存")
+                print("运行: pip install redis")
+                _redis_client = False
+    return _redis_client or None
+
+
+async def get_cached(key: str) -> Optional[bytes]:
+    """
+    读取缓存
+
+    Args:
+        key: 缓存键
+
+    Returns:
+        缓存的字节串,未命中或缓存不可用时返回None
+    """
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        return await client.get(key)
+    except Exception as e:
+        logger.warning("读取缓存错误: %s", e)
+        return None
+
+
+async def set_cached(key: str, value: bytes, ttl: int):
+    """
+    写入缓存
+
+    Args:
+        key: 缓存键
+        value: 序列化好的字节串
+        ttl: 过期时间(秒)
+    """
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        await client.setex(key, ttl, value)
+    except Exception as e:
+        logger.warning("写入缓存错误: %s", e)
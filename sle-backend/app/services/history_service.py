@@ -61,7 +61,7 @@ MOCK_PATIENT_DATA = {
 }
 
 
-async def get_medical_history(patient_id: str) -> Dict:
+def get_medical_history(patient_id: str) -> Dict:
     """
     获取患者的病史记录
     
@@ -91,7 +91,42 @@ async def get_medical_history(patient_id: str) -> Dict:
         }
 
 
-async def get_full_patient_history(patient_id: str) -> Dict:
+def _materialize_full(patient_id: str) -> Dict:
+    """
+    组装患者的完整历史记录
+    
+    Args:
+        patient_id: 患者ID
+        
+    Returns:
+        包含所有历史信息的字典
+    """
+    base_data = MOCK_PATIENT_DATA[patient_id]
+    # 模拟添加更多数据
+    return {
+        **base_data,
+        "patient_info": {
+            "patient_id": patient_id,
+            "name": f"患者{patient_id}",
+            "gender": "女",
+            "age": 35
+        },
+        "medications": ["泼尼松", "羟氯喹"],
+        "consultations": [
+            {
+                "date": "2026-01-15",
+                "symptoms": ["关节疼痛", "面部红斑"],
+                "advice": "继续当前治疗方案，注意休息"
+            }
+        ]
+    }
+
+
+# 模拟数据是静态的,完整历史记录在导入时组装一次,各请求共用同一对象,调用方不应修改
+_FULL_HISTORY_CACHE: Dict[str, Dict] = {pid: _materialize_full(pid) for pid in MOCK_PATIENT_DATA}
+
+
+def get_full_patient_history(patient_id: str) -> Dict:
     """
     获取患者的完整历史记录
     
@@ -104,27 +139,8 @@ async def get_full_patient_history(patient_id: str) -> Dict:
     try:
         # 模拟从数据库获取完整数据
         # 实际项目中会调用真实的数据库查询
-        if patient_id in MOCK_PATIENT_DATA:
-            base_data = MOCK_PATIENT_DATA[patient_id]
-            # 模拟添加更多数据
-            full_data = {
-                **base_data,
-                "patient_info": {
-                    "patient_id": patient_id,
-                    "name": f"患者{patient_id}",
-                    "gender": "女",
-                    "age": 35
-                },
-                "medications": ["泼尼松", "羟氯喹"],
-                "consultations": [
-                    {
-                        "date": "2026-01-15",
-                        "symptoms": ["关节疼痛", "面部红斑"],
-                        "advice": "继续当前治疗方案，注意休息"
-                    }
-                ]
-            }
-            return full_data
+        if patient_id in _FULL_HISTORY_CACHE:
+            return _FULL_HISTORY_CACHE[patient_id]
         else:
             # 患者不存在，返回空数据
             return {
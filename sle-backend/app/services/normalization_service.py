@@ -3,10 +3,12 @@
 用于将不同医院检查单上的相同项目名称归一化为标准术语
 """
 
-from typing import List, Dict
+from functools import lru_cache
+from typing import List, Dict, Optional
 import json
 import os
 import re
+import sys
 from app.services.ai_semantic_service import classify_term_with_ai, classify_terms_batch_with_ai
 from app.config.settings import settings
 
@@ -39,21 +41,111 @@ STANDARD_TERMS = {
     "IgM": ["免疫球蛋白M", "IgM抗体", "免疫球蛋白M测定"]
 }
 
-# 反向映射：从变体到标准术语
-VARIANT_TO_STANDARD = {}
-for standard, variants in STANDARD_TERMS.items():
-    for variant in variants:
-        # 添加原始变体
-        VARIANT_TO_STANDARD[variant] = standard
-        # 添加小写变体
-        VARIANT_TO_STANDARD[variant.lower()] = standard
-    # 标准术语本身也映射到自己
-    VARIANT_TO_STANDARD[standard] = standard
-    # 添加标准术语的小写形式
-    VARIANT_TO_STANDARD[standard.lower()] = standard
+# 反向映射：从清理后(小写)的变体到标准术语,由 _build_match_tables 构建
+VARIANT_TO_STANDARD: Dict[str, str] = {}
 
 
-async def normalize_medical_terms(terms: List[str]) -> List[Dict]:
+# 常见的非医学字段名
+COMMON_FIELDS = {
+    '名称': '名称',
+    '手机号': '手机号',
+    '联系电话': '联系电话',
+    '手机': '手机',
+    '客户姓名': '客户姓名',
+    '姓名': '姓名',
+    '收货人姓名': '收货人姓名',
+    '地址': '地址',
+    '收货地址': '收货地址',
+    '邮编': '邮编',
+    '身份证号': '身份证号',
+    '出生日期': '出生日期',
+    '性别': '性别',
+    '年龄': '年龄',
+    '民族': '民族',
+    '职业': '职业',
+    '婚姻状况': '婚姻状况',
+    '籍贯': '籍贯',
+    '工作单位': '工作单位',
+    '紧急联系人': '紧急联系人',
+    '邮箱': '邮箱',
+    'QQ': 'QQ',
+    '微信': '微信',
+    '备注': '备注'
+}
+COMMON_FIELDS_LOWER = [(field_name.lower(), field_name) for field_name in COMMON_FIELDS]
+
+# 术语清理规则: 连续空白、括号内容、特殊字符
+_RE_WS = re.compile(r'\s+')
+_RE_PAREN = re.compile(r'\([^)]*\)')
+_RE_NONWORD = re.compile(r'[^\w\s]')
+
+
+def _build_variant_automaton():
+    """
+    构建清理后变体的Aho-Corasick自动机,一次扫描术语即可找出其中包含的所有变体
+
+    Returns:
+        ahocorasick.Automaton 对象,值为变体在 _CLEAN_VARIANTS 中最靠前的下标;
+        未安装 pyahocorasick 时返回None(退化为逐个变体查找)
+    """
+    try:
+        import ahocorasick
+    except ImportError:
+        return None
+
+    automaton = ahocorasick.Automaton()
+    for index, (variant_clean, _) in enumerate(_CLEAN_VARIANTS):
+        if variant_clean and variant_clean not in automaton:
+            automaton.add_word(variant_clean, index)
+    if len(automaton) == 0:
+        return None
+    automaton.make_automaton()
+    return automaton
+
+
+def _build_match_tables():
+    """
+    预先清理术语库中的所有变体,供部分匹配和关键词匹配使用,避免每次归一化时重复清理
+
+    术语库更新后需要重新调用
+    """
+    global VARIANT_TO_STANDARD, _CLEAN_VARIANTS, _KEYWORD_SETS, _KEYWORD_INDEX, _VARIANT_SUBSTRINGS, \
+        _VARIANT_AUTOMATON, _EMPTY_VARIANT_INDEX
+    # 每个变体只保存清理后的一种写法,标准术语本身也映射到自己;
+    # 标准术语统一驻留,所有归一化结果共用同一个字符串对象
+    VARIANT_TO_STANDARD = {}
+    for standard, variants in STANDARD_TERMS.items():
+        standard = sys.intern(standard)
+        for variant in variants:
+            VARIANT_TO_STANDARD[_clean_term(variant)] = standard
+        VARIANT_TO_STANDARD[_clean_term(standard)] = standard
+    _CLEAN_VARIANTS = list(VARIANT_TO_STANDARD.items())
+    # 变体的所有子串(含空串) -> 最靠前的变体下标,一次字典查找即可判断术语是否被某个变体包含
+    _VARIANT_SUBSTRINGS = {}
+    for index, (variant_clean, _) in enumerate(_CLEAN_VARIANTS):
+        for start in range(len(variant_clean) + 1):
+            for end in range(start, len(variant_clean) + 1):
+                _VARIANT_SUBSTRINGS.setdefault(variant_clean[start:end], index)
+    _VARIANT_AUTOMATON = _build_variant_automaton()
+    # 清理后为空的变体包含于任何术语中,自动机无法收录,单独记录
+    _EMPTY_VARIANT_INDEX = next(
+        (index for index, (variant_clean, _) in enumerate(_CLEAN_VARIANTS) if not variant_clean),
+        len(_CLEAN_VARIANTS)
+    )
+    _KEYWORD_SETS = [
+        (set(_clean_term(t).split()), standard)
+        for standard, variants in STANDARD_TERMS.items()
+        for t in [standard] + variants
+    ]
+    # 关键词 -> 包含该关键词的 _KEYWORD_SETS 下标(升序),只需检查与术语有共同关键词的条目
+    _KEYWORD_INDEX = {}
+    for index, (variant_keywords, _) in enumerate(_KEYWORD_SETS):
+        for keyword in variant_keywords:
+            _KEYWORD_INDEX.setdefault(keyword, []).append(index)
+    _normalize_term_sync.cache_clear()
+
+
+def normalize_medical_terms(terms: List[str]) -> List[Dict]:
     """
     归一化医学术语列表
     
@@ -63,19 +155,14 @@ async def normalize_medical_terms(terms: List[str]) -> List[Dict]:
     Returns:
         归一化后的术语列表，每个元素包含原始术语、归一化术语和置信度
     """
-    normalized_terms = []
-    
-    for term in terms:
-        normalized, confidence = _normalize_term_sync(term)
-        normalized_terms.append({
-            "original": term,
-            "normalized": normalized,
-            "confidence": confidence
-        })
-    
-    return normalized_terms
+    return [
+        {"original": term, "normalized": normalized, "confidence": confidence}
+        for term in terms
+        for normalized, confidence in (_normalize_term_sync(term),)
+    ]
 
 
+@lru_cache(maxsize=4096)
 def _normalize_term_sync(term: str) -> tuple:
     """
     归一化单个医学术语（同步版本，不使用AI）
@@ -88,64 +175,32 @@ def _normalize_term_sync(term: str) -> tuple:
     """
     term_clean = _clean_term(term)
     
-    # 1. 精确匹配 - 考虑大小写
-    if term_clean in VARIANT_TO_STANDARD:
-        return VARIANT_TO_STANDARD[term_clean], 1.0
-    
-    # 检查原始术语的精确匹配
-    if term in VARIANT_TO_STANDARD:
-        return VARIANT_TO_STANDARD[term], 1.0
+    # 1. 精确匹配(清理后不区分大小写)
+    standard = VARIANT_TO_STANDARD.get(term_clean)
+    if standard is not None:
+        return standard, 1.0
     
     # 2. 部分匹配
-    for variant, standard in VARIANT_TO_STANDARD.items():
-        variant_clean = _clean_term(variant)
-        if variant_clean in term_clean or term_clean in variant_clean:
-            return standard, 0.8
+    standard = _find_partial_match(term_clean)
+    if standard is not None:
+        return standard, 0.8
     
-    # 3. 关键词匹配
-    for standard, variants in STANDARD_TERMS.items():
-        all_terms = [standard] + variants
-        for t in all_terms:
-            t_clean = _clean_term(t)
-            if _has_keyword_match(term_clean, t_clean):
-                return standard, 0.6
+    # 3. 关键词匹配: 共同关键词占较短一方的比例不低于一半
+    keywords = set(term_clean.split())
+    candidates = sorted({index for keyword in keywords for index in _KEYWORD_INDEX.get(keyword, ())})
+    for index in candidates:
+        variant_keywords, standard = _KEYWORD_SETS[index]
+        if len(keywords & variant_keywords) / min(len(keywords), len(variant_keywords)) >= 0.5:
+            return standard, 0.6
     
     # 4. 对于非医学术语，检查是否为常见字段名
-    common_fields = {
-        '名称': '名称',
-        '手机号': '手机号',
-        '联系电话': '联系电话',
-        '手机': '手机',
-        '客户姓名': '客户姓名',
-        '姓名': '姓名',
-        '收货人姓名': '收货人姓名',
-        '地址': '地址',
-        '收货地址': '收货地址',
-        '邮编': '邮编',
-        '身份证号': '身份证号',
-        '出生日期': '出生日期',
-        '性别': '性别',
-        '年龄': '年龄',
-        '民族': '民族',
-        '职业': '职业',
-        '婚姻状况': '婚姻状况',
-        '籍贯': '籍贯',
-        '工作单位': '工作单位',
-        '紧急联系人': '紧急联系人',
-        '邮箱': '邮箱',
-        'QQ': 'QQ',
-        '微信': '微信',
-        '备注': '备注'
-    }
-    
     # 检查精确匹配
-    if term in common_fields:
+    if term in COMMON_FIELDS:
         return term, 0.9
     
     # 检查部分匹配
     term_lower = term.lower()
-    for field_name in common_fields.keys():
-        field_lower = field_name.lower()
+    for field_lower, field_name in COMMON_FIELDS_LOWER:
         if field_lower in term_lower or term_lower in field_lower:
             return field_name, 0.8
     
@@ -153,6 +208,34 @@ def _normalize_term_sync(term: str) -> tuple:
     return term, 0.5
 
 
+def _find_partial_match(term_clean: str) -> Optional[str]:
+    """
+    部分匹配: 按术语库顺序找出第一个与术语互相包含的变体
+
+    Args:
+        term_clean: 清理后的术语
+
+    Returns:
+        该变体对应的标准术语,没有匹配时返回None
+    """
+    # 术语被变体包含
+    index = _VARIANT_SUBSTRINGS.get(term_clean, len(_CLEAN_VARIANTS))
+    # 变体被术语包含
+    if _VARIANT_AUTOMATON is not None:
+        index = min(index, _EMPTY_VARIANT_INDEX)
+        for _, variant_index in _VARIANT_AUTOMATON.iter(term_clean):
+            if variant_index < index:
+                index = variant_index
+    else:
+        for variant_index in range(index):
+            if _CLEAN_VARIANTS[variant_index][0] in term_clean:
+                index = variant_index
+                break
+    if index < len(_CLEAN_VARIANTS):
+        return _CLEAN_VARIANTS[index][1]
+    return None
+
+
 async def normalize_medical_terms_with_ai(terms: List[str], threshold: float = None) -> List[Dict]:
     """
     使用AI批量归一化医学术语列表
@@ -186,14 +269,16 @@ async def normalize_medical_terms_with_ai(terms: List[str], threshold: float = N
             "confidence": confidence
         })
     
-    # 对未知术语使用AI批量分类
+    # 对未知术语使用AI批量分类,同一报告中重复出现的术语只发送一次
     if unknown_terms:
         try:
-            ai_results = await classify_terms_batch_with_ai(unknown_terms, threshold)
-            for idx, ai_result in enumerate(ai_results):
-                original_idx = unknown_indices[idx]
+            unique_unknowns = list(dict.fromkeys(unknown_terms))
+            ai_results = await classify_terms_batch_with_ai(unique_unknowns, threshold)
+            by_term = dict(zip(unique_unknowns, ai_results))
+            for term, original_idx in zip(unknown_terms, unknown_indices):
+                ai_result = by_term[term]
                 normalized_terms[original_idx] = {
-                    "original": unknown_terms[idx],
+                    "original": term,
                     "normalized": ai_result["normalized"],
                     "confidence": ai_result["confidence"]
                 }
@@ -203,6 +288,7 @@ async def normalize_medical_terms_with_ai(terms: List[str], threshold: float = N
     return normalized_terms
 
 
+@lru_cache(maxsize=8192)
 def _clean_term(term: str) -> str:
     """
     清理术语，去除多余字符和空格
@@ -214,39 +300,16 @@ def _clean_term(term: str) -> str:
         清理后的术语
     """
     # 去除多余空格
-    term = re.sub(r'\s+', ' ', term).strip()
+    term = _RE_WS.sub(' ', term).strip()
     # 去除括号内容
-    term = re.sub(r'\([^)]*\)', '', term).strip()
+    term = _RE_PAREN.sub('', term).strip()
     # 去除特殊字符
-    term = re.sub(r'[^\w\s]', '', term).strip()
+    term = _RE_NONWORD.sub('', term).strip()
     # 转换为小写
     term = term.lower()
     return term
 
 
-def _has_keyword_match(term1: str, term2: str) -> bool:
-    """
-    检查两个术语是否有关键词匹配
-    
-    Args:
-        term1: 术语1
-        term2: 术语2
-        
-    Returns:
-        是否有关键词匹配
-    """
-    # 分割术语为关键词
-    keywords1 = set(term1.split())
-    keywords2 = set(term2.split())
-    
-    # 计算共同关键词比例
-    if not keywords1 or not keywords2:
-        return False
-    
-    common_keywords = keywords1.intersection(keywords2)
-    return len(common_keywords) / min(len(keywords1), len(keywords2)) >= 0.5
-
-
 def update_standard_terms(new_terms: Dict[str, List[str]]):
     """
     更新标准术语库
@@ -254,21 +317,19 @@ def update_standard_terms(new_terms: Dict[str, List[str]]):
     Args:
         new_terms: 新的术语映射
     """
-    global STANDARD_TERMS, VARIANT_TO_STANDARD
-    
     # 更新标准术语
     for standard, variants in new_terms.items():
+        standard = sys.intern(standard)
         if standard in STANDARD_TERMS:
             STANDARD_TERMS[standard].extend(variants)
         else:
             STANDARD_TERMS[standard] = variants
     
-    # 重新构建反向映射
-    VARIANT_TO_STANDARD = {}
-    for standard, variants in STANDARD_TERMS.items():
-        for variant in variants:
-            VARIANT_TO_STANDARD[variant] = standard
-        VARIANT_TO_STANDARD[standard] = standard
+    # 重新构建反向映射和匹配表
+    _build_match_tables()
+
+
+_build_match_tables()
 
 
 if __name__ == "__main__":
@@ -284,8 +345,7 @@ if __name__ == "__main__":
         "免疫球蛋白G"
     ]
     
-    import asyncio
-    result = asyncio.run(normalize_medical_terms(test_terms))
+    result = normalize_medical_terms(test_terms)
     
     print("测试结果:")
     for item in result:
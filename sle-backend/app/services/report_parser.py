@@ -9,6 +9,7 @@ import json
 from datetime import datetime
 from pathlib import Path
 from fastapi import UploadFile
+import logging
 import tempfile
 import os
 
@@ -16,6 +17,15 @@ from app.services.normalization_service import normalize_medical_terms
 from app.config.settings import settings
 from app.services.image_optimization_service import image_optimization_service
 
+logger = logging.getLogger(__name__)
+
+# 上传文件按块写入临时文件,避免一次性把整个文件读入内存
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# 检查日期和患者ID的提取规则
+_RE_DATE = re.compile(r'(\d{4}[-/年]\d{1,2}[-/月]\d{1,2}日?)')
+_RE_PATIENT_ID = re.compile(r'(患者ID|ID|就诊号|病历号).*?[:：]\s*([\w\d-]+)')
+
 # 全局OCR对象缓存
 _ocr_instance = None
 _ocr_lock = None
@@ -61,28 +71,28 @@ async def parse_report(file: UploadFile, report_type: str) -> Dict:
     """
     # 保存临时文件
     with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as temp_file:
-        content = await file.read()
-        temp_file.write(content)
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            temp_file.write(chunk)
         temp_file_path = temp_file.name
     
     try:
         # 提取文本
         text = extract_text_from_file(temp_file_path)
-        print(f"Extracted text length: {len(text)}")
+        logger.debug("Extracted text length: %d", len(text))
         
         # 解析指标
         indicators = await parse_indicators(text, report_type)
-        print(f"Parsed indicators: {len(indicators)}")
+        logger.debug("Parsed indicators: %d", len(indicators))
         
         # 尝试提取检查日期
-        date_match = re.search(r'(\d{4}[-/年]\d{1,2}[-/月]\d{1,2}日?)', text)
+        date_match = _RE_DATE.search(text)
         report_date = date_match.group(1) if date_match else datetime.now().strftime('%Y-%m-%d')
-        print(f"Report date: {report_date}")
+        logger.debug("Report date: %s", report_date)
         
         # 尝试提取患者ID
-        patient_id_match = re.search(r'(患者ID|ID|就诊号|病历号).*?[:：]\s*([\w\d-]+)', text)
+        patient_id_match = _RE_PATIENT_ID.search(text)
         patient_id = patient_id_match.group(2) if patient_id_match else None
-        print(f"Patient ID: {patient_id}")
+        logger.debug("Patient ID: %s", patient_id)
         
         normalized_terms = []
         normalized_indicators = []
@@ -116,7 +126,6 @@ async def parse_report(file: UploadFile, report_type: str) -> Dict:
             'normalization_results': normalized_terms,
             'original_text': text  # 添加原始文本
         }
-        print(f"Returning result: {result}")
         return result
     finally:
         # 删除临时文件
@@ -163,25 +172,16 @@ def extract_text_from_file(file_path: str) -> str:
             # 使用全局OCR实例
             ocr = get_ocr_instance()
             
-            # 优化图片以提升OCR效率
-            optimized_path = None
+            # 优化图片以提升OCR效率，直接在内存中把图片数组交给OCR，不写临时文件
             try:
-                optimized_path = image_optimization_service.optimize_for_ocr(str(file_path))
-                ocr_path = optimized_path
+                ocr_input = image_optimization_service.optimize_for_ocr(str(file_path), in_memory=True)
             except Exception as opt_error:
                 if settings.DEBUG:
                     print(f"图片优化失败，使用原始图片: {opt_error}")
-                ocr_path = str(file_path)
+                ocr_input = str(file_path)
             
             # 进行OCR
-            result = ocr.ocr(ocr_path)
-            
-            # 清理临时优化文件
-            if optimized_path and Path(optimized_path).exists():
-                try:
-                    Path(optimized_path).unlink()
-                except:
-                    pass
+            result = ocr.ocr(ocr_input)
             
             # 提取文本 - 无论det_model设置如何，cnocr都返回字典列表
             if result and isinstance(result, list):
@@ -0,0 +1,180 @@
+"""
+AI术语分类结果缓存
+医学术语词汇量小、重复率高,相同术语的分类结果直接复用,跳过AI接口调用;
+相同提示词的接口响应也按请求体哈希缓存
+"""
+
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import copy
+import json
+import sqlite3
+import threading
+import time
+
+CacheKey = Tuple[str, str, str]
+
+
+class TermCache:
+    """
+    按 (服务提供方, 模型, 术语) 精确匹配的分类结果缓存
+
+    内存中使用LRU淘汰,配置数据库路径时同时持久化到SQLite,进程重启后仍可命中
+    """
+
+    def __init__(self, db_path: Optional[str] = None, maxsize: int = 4096):
+        """
+        Args:
+            db_path: SQLite数据库路径,不指定则只缓存在内存中
+            maxsize: 内存中最多缓存的术语数
+        """
+        self.maxsize = maxsize
+        self._memory: "OrderedDict[CacheKey, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS term_cache ("
+                "provider TEXT, model TEXT, term TEXT, result TEXT, "
+                "PRIMARY KEY (provider, model, term))"
+            )
+            self._db.commit()
+
+    def get(self, provider: str, model: str, term: str) -> Optional[Dict]:
+        """
+        查询缓存
+
+        Args:
+            provider: AI服务提供方
+            model: 模型名称
+            term: 术语
+
+        Returns:
+            分类结果副本,未命中返回None
+        """
+        key = (provider, model, term)
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                return copy.deepcopy(result)
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT result FROM term_cache WHERE provider = ? AND model = ? AND term = ?", key
+            ).fetchone()
+            if row is None:
+                return None
+            result = json.loads(row[0])
+            self._remember(key, result)
+            return copy.deepcopy(result)
+
+    def set(self, provider: str, model: str, term: str, result: Dict):
+        """
+        写入缓存
+
+        Args:
+            provider: AI服务提供方
+            model: 模型名称
+            term: 术语
+            result: 分类结果
+        """
+        key = (provider, model, term)
+        result = copy.deepcopy(result)
+        with self._lock:
+            self._remember(key, result)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO term_cache (provider, model, term, result) VALUES (?, ?, ?, ?)",
+                    (*key, json.dumps(result, ensure_ascii=False))
+                )
+                self._db.commit()
+
+    def _remember(self, key: CacheKey, result: Dict):
+        """放入内存LRU,超出容量时淘汰最久未使用的术语"""
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+
+class ResponseCache:
+    """
+    按请求体哈希精确匹配的AI接口响应缓存
+
+    模型和提示词完全相同(同一批术语、同一份报告文本)时直接复用上次的响应内容,超过有效期后重新请求
+    """
+
+    def __init__(self, db_path: Optional[str] = None, maxsize: int = 1024, ttl: float = 7 * 24 * 3600):
+        """
+        Args:
+            db_path: SQLite数据库路径,不指定则只缓存在内存中
+            maxsize: 内存中最多缓存的响应数
+            ttl: 有效期(秒)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, expires_at REAL, content BLOB)"
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        查询缓存
+
+        Args:
+            key: 请求体哈希
+
+        Returns:
+            响应内容,未命中或已过期返回None
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT expires_at, content FROM response_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    entry = (row[0], bytes(row[1]))
+                    self._remember(key, entry)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, content: bytes):
+        """
+        写入缓存
+
+        Args:
+            key: 请求体哈希
+            content: 响应内容
+        """
+        entry = (time.time() + self.ttl, content)
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO response_cache (key, expires_at, content) VALUES (?, ?, ?)",
+                    (key, *entry)
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, entry: Tuple[float, bytes]):
+        """放入内存LRU,超出容量时淘汰最久未使用的响应"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
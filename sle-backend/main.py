@@ -1,7 +1,22 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from app.config.settings import settings
-from app.api import routes
+from app.api import routes, auth, patient
+from app.api.responses import ORJSONResponse
+from app.services.ai_semantic_service import ai_semantic_service
+
+logging.basicConfig(level=settings.LOG_LEVEL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期: 关闭时释放AI服务复用的HTTP连接"""
+    yield
+    await ai_semantic_service.aclose()
+
 
 # 创建FastAPI应用实例
 app = FastAPI(
@@ -9,7 +24,10 @@ app = FastAPI(
     version=settings.APP_VERSION,
     description="SLE医疗顾问后端API服务",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    # 所有接口默认使用 orjson 序列化响应
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # 配置CORS
@@ -21,8 +39,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 压缩较大的JSON响应(病史、检查单解析结果中有大量重复的中文字段)
+app.add_middleware(GZipMiddleware, minimum_size=500, compresslevel=5)
+
 # 注册路由
 app.include_router(routes.router)
+app.include_router(auth.router)
+app.include_router(patient.router)
 
 # 根路径
 @app.get("/")
@@ -37,3 +60,8 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -88,7 +88,7 @@ class NormalizationPerformanceTester:
             indicator_names = [ind.get('name', '') for ind in indicators]
             
             norm_start = time.time()
-            normalized_results = self._run_async(normalize_medical_terms(indicator_names))
+            normalized_results = normalize_medical_terms(indicator_names)
             norm_time = time.time() - norm_start
             
             result['timings']['normalization'] = norm_time
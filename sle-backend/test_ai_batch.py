@@ -0,0 +1,98 @@
+"""
+测试AI批量分类结果与输入术语的对应关系
+"""
+
+import asyncio
+import json
+
+import httpx
+
+from app.services.ai_semantic_service import ZhipuClassifier, expand_batch_results
+
+
+def batch_completion(results) -> httpx.Response:
+    """构造模型输出为批量分类结果的对话补全响应"""
+    content = json.dumps({"results": results}, ensure_ascii=False)
+    return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+
+def make_classifier(handler) -> ZhipuClassifier:
+    """创建通过 MockTransport 调用 handler 的分类器"""
+    classifier = ZhipuClassifier()
+    classifier.api_key = "test"
+    client = httpx.AsyncClient(base_url="http://ai.test", transport=httpx.MockTransport(handler))
+    classifier._get_client = lambda: client
+    return classifier
+
+
+def result(original, normalized, confidence=0.9):
+    return {"original": original, "normalized": normalized, "category": "免疫功能",
+            "confidence": confidence, "explanation": "x"}
+
+
+def test_model_omits_middle_term():
+    terms = ["补体C3c", "IgG亚类", "C4补体成分"]
+    results = [result("补体c3c", "C3"), result("c4补体成分", "C4")]
+    classifier = make_classifier(lambda request: batch_completion(results))
+
+    expanded = asyncio.run(classifier._classify_batch_with_ai(terms))
+    assert [r["original"] for r in expanded] == terms
+    assert [r["normalized"] for r in expanded] == ["C3", "IgG亚类", "C4"]
+    assert [r["confidence"] for r in expanded] == [0.9, 0.0, 0.9]
+
+
+def test_reordered_results_match_by_original():
+    terms = ["补体C3c", "C4补体成分"]
+    expanded = expand_batch_results(terms, ["补体c3c", "c4补体成分"],
+                                    [result("C4补体成分", "C4"), result("补体C3c", "C3")])
+    assert [r["normalized"] for r in expanded] == ["C3", "C4"]
+
+
+def test_positional_fallback_only_without_original():
+    terms = ["补体C3c", "C4补体成分"]
+    unique_terms = ["补体c3c", "c4补体成分"]
+    bare = [{"normalized": "C3", "confidence": 0.9}, {"normalized": "C4", "confidence": 0.9}]
+    expanded = expand_batch_results(terms, unique_terms, bare)
+    assert [r["normalized"] for r in expanded] == ["C3", "C4"]
+    # 按位置对应的结果无法核对,不带 original
+    assert all("original" not in r for r in expanded)
+
+    # 数量不一致时不按位置对应
+    expanded = expand_batch_results(terms, unique_terms, bare[1:])
+    assert [r["confidence"] for r in expanded] == [0.0, 0.0]
+
+
+def test_batch_caches_only_verified_results():
+    from app.services.ai_semantic_service import AISemanticService
+    from app.services.term_cache import ResponseCache, TermCache
+
+    responses = [
+        # 不带 original 的结果按位置对应,无法核对,不缓存
+        [{"normalized": "C3", "confidence": 0.9}, {"normalized": "C4", "confidence": 0.9}],
+        [result("补体c3c", "C3"), result("c4补体成分", "C4")],
+    ]
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return batch_completion(responses.pop(0))
+
+    service = AISemanticService()
+    service.cache = TermCache(None, 100)
+    service.classifier = make_classifier(handler)
+    terms = ["补体C3c", "C4补体成分"]
+
+    async def run():
+        first = await service.classify_terms_batch(terms, threshold=0.5)
+        assert [r["normalized"] for r in first] == ["C3", "C4"]
+        assert [r["original"] for r in first] == terms
+        assert all(service._get_cached(term) is None for term in terms)
+
+        # 清空相同提示词的响应缓存,让第二次调用拿到带 original 的结果
+        service.classifier._response_cache = ResponseCache()
+        await service.classify_terms_batch(terms, threshold=0.5)
+        assert [service._get_cached(term)["normalized"] for term in terms] == ["C3", "C4"]
+        await service.classify_terms_batch(terms, threshold=0.5)
+
+    asyncio.run(run())
+    assert len(calls) == 2
@@ -0,0 +1,151 @@
+"""
+测试AI接口调用的重试、Retry-After、熔断和响应缓存
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from app.config.settings import settings
+from app.services import ai_semantic_service
+from app.services.ai_semantic_service import CircuitOpenError, ZhipuClassifier
+
+_real_sleep = asyncio.sleep
+
+
+def completion(status_code: int = 200, headers=None) -> httpx.Response:
+    """构造一个模型输出为合法JSON的对话补全响应"""
+    content = json.dumps({"normalized": "C3", "category": "免疫功能", "confidence": 0.9, "explanation": "x"})
+    return httpx.Response(status_code, headers=headers,
+                          json={"choices": [{"message": {"content": content}}]})
+
+
+def make_classifier(handler) -> ZhipuClassifier:
+    """创建通过 MockTransport 调用 handler 的分类器"""
+    classifier = ZhipuClassifier()
+    client = httpx.AsyncClient(base_url="http://ai.test", transport=httpx.MockTransport(handler))
+    classifier._get_client = lambda: client
+    return classifier
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """记录重试前的等待时间,不真正等待"""
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+        await _real_sleep(0)
+
+    monkeypatch.setattr(ai_semantic_service.asyncio, "sleep", fake_sleep)
+    return delays
+
+
+def test_retry_5xx_then_success(sleeps):
+    statuses = [503, 200]
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return completion(statuses.pop(0))
+
+    classifier = make_classifier(handler)
+    response = asyncio.run(classifier._post_chat("补体C3", timeout=5))
+    assert response.status_code == 200
+    assert len(calls) == 2
+    assert len(sleeps) == 1 and 1 <= sleeps[0] < 1.1
+
+
+def test_retry_after_on_429(sleeps):
+    responses = [completion(429, headers={"Retry-After": "7"}), completion(200)]
+    classifier = make_classifier(lambda request: responses.pop(0))
+
+    response = asyncio.run(classifier._post_chat("补体C3", timeout=5))
+    assert response.status_code == 200
+    assert len(sleeps) == 1 and 7 <= sleeps[0] < 7.1
+
+
+def test_circuit_opens_after_exhausted_calls(sleeps):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return completion(500)
+
+    classifier = make_classifier(handler)
+    attempts = settings.AI_MAX_RETRIES + 1
+
+    async def run():
+        for index in range(settings.AI_CIRCUIT_FAILURES):
+            response = await classifier._post_chat(f"术语{index}", timeout=5)
+            assert response.status_code == 500
+        assert len(calls) == settings.AI_CIRCUIT_FAILURES * attempts
+        with pytest.raises(CircuitOpenError):
+            await classifier._post_chat("术语", timeout=5)
+        assert len(calls) == settings.AI_CIRCUIT_FAILURES * attempts
+
+    asyncio.run(run())
+
+
+def test_half_open_single_probe(sleeps):
+    statuses = [500, 200, 200]
+    calls = []
+    gate = asyncio.Event()
+
+    async def handler(request):
+        calls.append(request)
+        await gate.wait()
+        return completion(statuses.pop(0))
+
+    classifier = make_classifier(handler)
+
+    async def run():
+        # 冷却已结束: 只放行一个探测请求,探测失败后不重试并重新冷却
+        classifier._circuit_open_until = time.monotonic() - 1
+        gate.set()
+        response = await classifier._post_chat("探测1", timeout=5)
+        assert response.status_code == 500
+        assert len(calls) == 1
+        with pytest.raises(CircuitOpenError):
+            await classifier._post_chat("探测2", timeout=5)
+
+        # 探测进行中的其他请求仍被拒绝,探测成功后熔断关闭
+        classifier._circuit_open_until = time.monotonic() - 1
+        gate.clear()
+        probe = asyncio.create_task(classifier._post_chat("探测3", timeout=5))
+        await _real_sleep(0)
+        with pytest.raises(CircuitOpenError):
+            await classifier._post_chat("探测4", timeout=5)
+        gate.set()
+        assert (await probe).status_code == 200
+        assert classifier._circuit_open_until == 0.0
+        assert (await classifier._post_chat("探测5", timeout=5)).status_code == 200
+        assert len(calls) == 3
+
+    asyncio.run(run())
+    assert sleeps == []
+
+
+def test_cache_hit_while_circuit_open(sleeps):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return completion(200)
+
+    classifier = make_classifier(handler)
+
+    async def run():
+        await classifier._post_chat("补体C3", timeout=5)
+        classifier._circuit_open_until = time.monotonic() + 60
+        response = await classifier._post_chat("补体C3", timeout=5)
+        assert response.status_code == 200
+        assert response.json() == completion(200).json()
+        with pytest.raises(CircuitOpenError):
+            await classifier._post_chat("补体C4", timeout=5)
+
+    asyncio.run(run())
+    assert len(calls) == 1
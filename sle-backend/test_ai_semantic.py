@@ -72,7 +72,7 @@ async def test_normalization_integration():
         "未知术语测试"
     ]
     
-    results = await normalize_medical_terms(test_terms)
+    results = normalize_medical_terms(test_terms)
     
     for result in results:
         print(f"{result['original']:<20} → {result['normalized']:<20} (置信度: {result['confidence']:.2f})")
@@ -24,7 +24,7 @@ async def test_known_terms():
         "免疫球蛋白G"    # 部分匹配
     ]
     
-    results = await normalize_medical_terms(known_terms)
+    results = normalize_medical_terms(known_terms)
     
     print(f"{'原始术语':<20} {'归一化结果':<20} {'置信度':<10} {'方法'}")
     print("-" * 70)
@@ -56,7 +56,7 @@ async def test_unknown_terms():
         "联系电话"        # 常见字段
     ]
     
-    results = await normalize_medical_terms(unknown_terms)
+    results = normalize_medical_terms(unknown_terms)
     
     print(f"{'原始术语':<20} {'归一化结果':<20} {'置信度':<10} {'方法'}")
     print("-" * 70)
@@ -136,7 +136,7 @@ async def test_mixed_terms():
         "血红蛋白浓度"   # 已知变体
     ]
     
-    results = await normalize_medical_terms(mixed_terms)
+    results = normalize_medical_terms(mixed_terms)
     
     print(f"{'原始术语':<20} {'归一化结果':<20} {'置信度':<10} {'方法'}")
     print("-" * 70)
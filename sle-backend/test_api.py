@@ -1,34 +1,105 @@
-import requests
 import json
 
-# 测试健康检查接口
-print("测试健康检查接口...")
-response = requests.get("http://127.0.0.1:8000/health")
-print(f"状态码: {response.status_code}")
-print(f"响应: {response.json()}")
-print()
-
-# 测试表单名称归一化接口
-print("测试表单名称归一化接口...")
-url = "http://127.0.0.1:8000/normalize"
-headers = {"Content-Type": "application/json"}
-data = {
-    "terms": ["ANA", "白细胞", "尿蛋白", "C3补体", "抗dsDNA抗体"]
-}
-
-response = requests.post(url, headers=headers, data=json.dumps(data))
-print(f"状态码: {response.status_code}")
-if response.status_code == 200:
-    print(f"响应: {json.dumps(response.json(), ensure_ascii=False, indent=2)}")
-else:
-    print(f"错误: {response.text}")
-print()
-
-# 测试获取患者病史接口
-print("测试获取患者病史接口...")
-response = requests.get("http://127.0.0.1:8000/medical-history/1")
-print(f"状态码: {response.status_code}")
-if response.status_code == 200:
-    print(f"响应: {json.dumps(response.json(), ensure_ascii=False, indent=2)}")
-else:
-    print(f"错误: {response.text}")
+
+def test_etag_not_modified():
+    """回传ETag时返回304且不带响应体"""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    client = TestClient(app)
+    response = client.get("/api/patient/1")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    response = client.get("/api/patient/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_weak_etag_not_modified():
+    """经GZip或代理弱化为 W/ 前缀的ETag同样返回304"""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    client = TestClient(app)
+    etag = client.get("/api/patient/1").headers["etag"]
+
+    response = client.get("/api/patient/1", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_upload_rejects_malformed_record():
+    """缺少必需字段的上传记录返回400,不修改患者数据"""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    client = TestClient(app)
+    etag = client.get("/api/patient/1").headers["etag"]
+
+    for body in (None, {"type": "blood"}, {"type": "blood", "test_id": 7, "date": "2026-03-01", "data": [1]}):
+        response = client.post("/api/patient/1/upload", json=body)
+        assert response.status_code == 400
+        assert "error" in response.json()
+
+    assert client.get("/api/patient/1").headers["etag"] == etag
+
+
+def test_upload_invalid_blood_record_keeps_history():
+    """血常规数据无法转换时返回400,之后的有效上传仍然成功"""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    client = TestClient(app)
+    etag = client.get("/api/patient/1").headers["etag"]
+
+    for record in ({"test_id": 7, "date": "2026年3月1日", "data": {"白细胞计数": 5.0}},
+                   {"test_id": 7, "date": "2026-03-01", "data": {"白细胞计数": "偏高"}}):
+        response = client.post("/api/patient/1/upload", json={"type": "blood", **record})
+        assert response.status_code == 400
+    assert client.get("/api/patient/1").headers["etag"] == etag
+
+    record = {"type": "blood", "test_id": 7, "date": "2026-03-01", "data": {"白细胞计数": 12.5}}
+    assert client.post("/api/patient/1/upload", json=record).status_code == 201
+    abnormal = client.get("/api/patient/1/abnormal").json()
+    assert any(item["test_id"] == 7 and item["index"] == "白细胞计数" for item in abnormal)
+
+
+def main():
+    import requests
+
+    # 测试健康检查接口
+    print("测试健康检查接口...")
+    response = requests.get("http://127.0.0.1:8000/health")
+    print(f"状态码: {response.status_code}")
+    print(f"响应: {response.json()}")
+    print()
+
+    # 测试表单名称归一化接口
+    print("测试表单名称归一化接口...")
+    url = "http://127.0.0.1:8000/normalize"
+    headers = {"Content-Type": "application/json"}
+    data = {
+        "terms": ["ANA", "白细胞", "尿蛋白", "C3补体", "抗dsDNA抗体"]
+    }
+
+    response = requests.post(url, headers=headers, data=json.dumps(data))
+    print(f"状态码: {response.status_code}")
+    if response.status_code == 200:
+        print(f"响应: {json.dumps(response.json(), ensure_ascii=False, indent=2)}")
+    else:
+        print(f"错误: {response.text}")
+    print()
+
+    # 测试获取患者病史接口
+    print("测试获取患者病史接口...")
+    response = requests.get("http://127.0.0.1:8000/medical-history/1")
+    print(f"状态码: {response.status_code}")
+    if response.status_code == 200:
+        print(f"响应: {json.dumps(response.json(), ensure_ascii=False, indent=2)}")
+    else:
+        print(f"错误: {response.text}")
+
+
+if __name__ == "__main__":
+    main()
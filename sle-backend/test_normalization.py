@@ -1,32 +1,108 @@
-import requests
+import copy
 import json
+import sys
 
-# 测试表单归一化接口 - 非医学术语
-print("测试表单归一化接口 - 非医学术语...")
-url = "http://127.0.0.1:8000/normalize"
-headers = {"Content-Type": "application/json"}
-data = {
-    "terms": ["名称", "手机号", "联系电话", "手机", "客户姓名", "姓名", "收货人姓名"]
+import pytest
+
+from app.services import normalization_service
+
+# 探针术语 -> 期望的 (归一化术语, 置信度),覆盖精确、部分、关键词、常见字段和兜底各分支
+PROBES = {
+    "ANA": ("抗核抗体", 1.0),
+    "ana": ("抗核抗体", 1.0),
+    "抗核抗体": ("抗核抗体", 1.0),
+    "白细胞": ("尿白细胞", 1.0),
+    "WBC": ("白细胞计数", 1.0),
+    "抗dsDNA抗体": ("抗双链DNA抗体", 1.0),
+    "C3补体": ("C3", 1.0),
+    "补体 C3 (速率法)": ("C3", 0.8),
+    "血红蛋白测定": ("血红蛋白", 0.8),
+    "血小": ("血小板计数", 0.8),
+    "尿潜血(+)": ("尿红细胞", 1.0),
+    "IgG4": ("IgG", 0.8),
+    "免疫球蛋白 G": ("尿蛋白", 0.8),
+    "c3 c4": ("C3", 0.8),
+    "名称": ("名称", 0.9),
+    "手机号码": ("手机号", 0.8),
+    "收货人姓名": ("收货人姓名", 0.9),
+    "备注": ("备注", 0.9),
+    "": ("抗核抗体", 0.8),
+    "  ": ("抗核抗体", 0.8),
 }
 
-response = requests.post(url, headers=headers, data=json.dumps(data))
-print(f"状态码: {response.status_code}")
-if response.status_code == 200:
-    print(f"响应: {json.dumps(response.json(), ensure_ascii=False, indent=2)}")
-else:
-    print(f"错误: {response.text}")
-print()
-
-# 测试表单归一化接口 - 医学术语
-print("测试表单归一化接口 - 医学术语...")
-data = {
-    "terms": ["ANA", "白细胞", "尿蛋白", "C3补体", "抗dsDNA抗体"]
+# update_standard_terms 之后新增的探针
+UPDATED_TERMS = {"肌酐": ["Cr", "血肌酐"], "C3": ["C3c"]}
+UPDATED_PROBES = {
+    "肌酐": ("肌酐", 1.0),
+    "血肌酐": ("肌酐", 1.0),
+    "CR": ("肌酐", 1.0),
+    "血清肌酐测定": ("肌酐", 0.8),
+    "C3c": ("C3", 1.0),
 }
 
-response = requests.post(url, headers=headers, data=json.dumps(data))
-print(f"状态码: {response.status_code}")
-if response.status_code == 200:
-    print(f"响应: {json.dumps(response.json(), ensure_ascii=False, indent=2)}")
-else:
-    print(f"错误: {response.text}")
-print()
\ No newline at end of file
+
+@pytest.fixture(params=["automaton", "fallback"])
+def match_tables(request, monkeypatch):
+    """分别在有/无 pyahocorasick 时重建匹配表,结束后恢复术语库"""
+    if request.param == "automaton":
+        pytest.importorskip("ahocorasick")
+    else:
+        monkeypatch.setitem(sys.modules, "ahocorasick", None)
+    saved_terms = copy.deepcopy(normalization_service.STANDARD_TERMS)
+    normalization_service._build_match_tables()
+    assert (normalization_service._VARIANT_AUTOMATON is None) == (request.param == "fallback")
+    yield
+    normalization_service.STANDARD_TERMS.clear()
+    normalization_service.STANDARD_TERMS.update(saved_terms)
+    monkeypatch.undo()
+    normalization_service._build_match_tables()
+
+
+def test_normalize_term_probes(match_tables):
+    results = {term: normalization_service._normalize_term_sync(term) for term in PROBES}
+    assert results == PROBES
+
+
+def test_normalize_term_probes_after_update(match_tables):
+    normalization_service.update_standard_terms(copy.deepcopy(UPDATED_TERMS))
+    expected = {**PROBES, **UPDATED_PROBES}
+    results = {term: normalization_service._normalize_term_sync(term) for term in expected}
+    assert results == expected
+
+
+def main():
+    import requests
+
+    # 测试表单归一化接口 - 非医学术语
+    print("测试表单归一化接口 - 非医学术语...")
+    url = "http://127.0.0.1:8000/normalize"
+    headers = {"Content-Type": "application/json"}
+    data = {
+        "terms": ["名称", "手机号", "联系电话", "手机", "客户姓名", "姓名", "收货人姓名"]
+    }
+
+    response = requests.post(url, headers=headers, data=json.dumps(data))
+    print(f"状态码: {response.status_code}")
+    if response.status_code == 200:
+        print(f"响应: {json.dumps(response.json(), ensure_ascii=False, indent=2)}")
+    else:
+        print(f"错误: {response.text}")
+    print()
+
+    # 测试表单归一化接口 - 医学术语
+    print("测试表单归一化接口 - 医学术语...")
+    data = {
+        "terms": ["ANA", "白细胞", "尿蛋白", "C3补体", "抗dsDNA抗体"]
+    }
+
+    response = requests.post(url, headers=headers, data=json.dumps(data))
+    print(f"状态码: {response.status_code}")
+    if response.status_code == 200:
+        print(f"响应: {json.dumps(response.json(), ensure_ascii=False, indent=2)}")
+    else:
+        print(f"错误: {response.text}")
+    print()
+
+
+if __name__ == "__main__":
+    main()